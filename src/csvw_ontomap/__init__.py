@@ -2,8 +2,22 @@
 
 Automatically extract columns datatypes, if they are categorical, which values are accepted.
 Map to ontology concepts if OWL ontology provided"""
+from typing import TYPE_CHECKING, Any
 
 __version__ = "0.0.1"
 
 from .utils import OntomapConfig
-from .profiler import CsvwProfiler
+
+if TYPE_CHECKING:
+    from .profiler import CsvwProfiler
+
+__all__ = ["CsvwProfiler", "OntomapConfig", "__version__"]
+
+
+def __getattr__(name: str) -> Any:
+    # Import the profiler when it is used, since it loads pandas
+    if name == "CsvwProfiler":
+        from .profiler import CsvwProfiler  # noqa: PLC0415
+
+        return CsvwProfiler
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,12 +1,25 @@
+import contextlib
 import json
-from typing import List
+import logging
+import sys
+from typing import Any, List
 
 import typer
+from typer.core import TyperGroup
 
-from csvw_ontomap.profiler import CsvwProfiler
-from csvw_ontomap.utils import BOLD, CYAN, END, OntomapConfig
+from csvw_ontomap.utils import BOLD, CYAN, DEFAULT_EMBEDDING_MODEL, END, OntomapConfig, log
 
-cli = typer.Typer()
+
+class DefaultProfileGroup(TyperGroup):
+    """Run the profile command when the first argument is not a command, e.g. `csvw-ontomap data/*.csv`"""
+
+    def parse_args(self, ctx: Any, args: List[str]) -> List[str]:
+        if args and args[0] not in self.commands and args[0] not in ctx.help_option_names:
+            args = ["profile", *args]
+        return super().parse_args(ctx, args)
+
+
+cli = typer.Typer(cls=DefaultProfileGroup)
 
 
 @cli.command("profile")
@@ -14,26 +27,135 @@ def cli_profile(
     files: List[str] = typer.Argument(None, help="Files to profile"),
     ontologies: List[str] = typer.Option(None, "-m", help="URLs to the OWL ontologies to map the CSV columns to"),
     vectordb: str = typer.Option("data/vectordb", "-d", help="Path to the VectorDB"),
+    vectordb_url: str = typer.Option(
+        None, help="URL of a Qdrant server storing the vectors, instead of the local VectorDB"
+    ),
+    embedding_model: str = typer.Option(
+        DEFAULT_EMBEDDING_MODEL, help="FastEmbed model used to embed the labels, e.g. BAAI/bge-small-en-v1.5"
+    ),
+    quantization: str = typer.Option(
+        "none", help="Quantization of the vectors in a Qdrant server: none, scalar (int8) or product"
+    ),
+    vectors_on_disk: bool = typer.Option(False, help="Store the vectors on disk, memory-mapped, in a Qdrant server"),
+    refresh: bool = typer.Option(False, help="Reload the ontologies in the VectorDB even if they did not change"),
     best_matches: int = typer.Option(0, help="Number of best matches to add to each column as rdfs:comment"),
     threshold: float = typer.Option(
         0, help="Do not add propertyUrl if the match score is under this threshold, between 0 and 1"
     ),
+    engine: str = typer.Option(
+        "full", help="Profiling engine: full (ydata-profiling) or fast (only compute what is needed for CSVW)"
+    ),
+    chunk_size: int = typer.Option(
+        0, help="Profile CSV files in streaming by chunks of this number of rows, to use a bounded amount of memory"
+    ),
+    sample_rows: int = typer.Option(0, help="Profile a uniform sample of this number of rows, taken in one pass"),
+    sample_fraction: float = typer.Option(0, help="Profile a sample of this fraction of the rows, between 0 and 1"),
+    columns: List[str] = typer.Option(
+        None, "--column", help="Name of a column to profile, the other columns are not loaded, can be repeated"
+    ),
+    workers: int = typer.Option(1, help="Number of processes used to profile files in parallel"),
+    ingest_workers: int = typer.Option(
+        1, help="Number of ontologies parsed at the same time, and of processes used to embed their labels"
+    ),
+    term_types: List[str] = typer.Option(
+        None, "--term-type", help="Only map columns to terms of this type: class, property or URI, can be repeated"
+    ),
+    label_predicates: List[str] = typer.Option(
+        None, "--label-predicate", help="URI of a predicate of the ontology terms labels to embed, can be repeated"
+    ),
+    cache: str = typer.Option(
+        None, help="Path to a SQLite cache of the profiled tables, only new or changed files are profiled again"
+    ),
     output: str = typer.Option(None, "-o", help="Path to save the generated CSVW JSON metadata"),
+    json_lines: bool = typer.Option(
+        False, help="Write the metadata of each table on a line (JSON Lines), instead of a CSVW JSON document"
+    ),
+    stats: bool = typer.Option(
+        False, help="Log the time and memory used by each stage when it ends, and print a summary at the end"
+    ),
+    report_metrics: bool = typer.Option(False, help="Add the time and memory used by each stage to the CSVW metadata"),
     verbose: bool = typer.Option(True, help="Display logs"),
 ) -> None:
+    # Imported when running the command, to display the help without loading pandas
+    from csvw_ontomap.profiler import CsvwProfiler  # noqa: PLC0415
+
+    if stats:
+        log.setLevel(logging.DEBUG)
     config = OntomapConfig(
         comment_best_matches=best_matches,
         search_threshold=threshold,
+        profiling_engine=engine,
+        chunk_size=chunk_size,
+        sample_rows=sample_rows,
+        sample_fraction=sample_fraction,
+        columns=columns if columns else [],
+        term_types=term_types if term_types else [],
+        workers=workers,
+        ingest_workers=ingest_workers,
+        report_metrics=report_metrics,
+        profile_cache=cache if cache else "",
+        embedding_model=embedding_model,
+        quantization=quantization,
+        vectors_on_disk=vectors_on_disk,
+        vectordb_url=vectordb_url if vectordb_url else "",
+    )
+    if label_predicates:
+        config.label_predicates = label_predicates
+    stdout = sys.stdout
+    # When the metadata is written to stdout, the progress is printed to stderr to keep the output valid JSON
+    with contextlib.redirect_stdout(stdout if output else sys.stderr):
+        profiler = CsvwProfiler(ontologies, vectordb, config, refresh=refresh)
+        if output:
+            if verbose:
+                print(f"Writing to file {BOLD}{CYAN}{output}{END}")
+            # Each table is written to the file as soon as it is profiled
+            profiler.write_files(files, output, json_lines)
+        elif json_lines:
+            profiler.write_files(files, stdout, json_lines)
+        else:
+            print(json.dumps(profiler.profile_files(files), indent=2), file=stdout)
+        if stats:
+            print(f"\n⏱️  Time and memory used by each stage:\n{profiler.metrics.summary()}", file=sys.stderr)
+
+
+@cli.command("serve")
+def cli_serve(
+    ontologies: List[str] = typer.Option(None, "-m", help="URLs to the OWL ontologies to map the CSV columns to"),
+    vectordb: str = typer.Option("data/vectordb", "-d", help="Path to the VectorDB"),
+    vectordb_url: str = typer.Option(
+        None, help="URL of a Qdrant server storing the vectors, instead of the local VectorDB"
+    ),
+    embedding_model: str = typer.Option(
+        DEFAULT_EMBEDDING_MODEL, help="FastEmbed model used to embed the labels, e.g. BAAI/bge-small-en-v1.5"
+    ),
+    quantization: str = typer.Option(
+        "none", help="Quantization of the vectors in a Qdrant server: none, scalar (int8) or product"
+    ),
+    vectors_on_disk: bool = typer.Option(False, help="Store the vectors on disk, memory-mapped, in a Qdrant server"),
+    host: str = typer.Option("127.0.0.1", help="Host of the HTTP server"),
+    port: int = typer.Option(8000, help="Port of the HTTP server"),
+    jobs: int = typer.Option(2, help="Number of profiling jobs running at the same time"),
+    refresh: bool = typer.Option(False, help="Reload the ontologies in the VectorDB even if they did not change"),
+    best_matches: int = typer.Option(0, help="Number of best matches to add to each column as rdfs:comment"),
+    engine: str = typer.Option(
+        "full", help="Profiling engine: full (ydata-profiling) or fast (only compute what is needed for CSVW)"
+    ),
+    stats: bool = typer.Option(False, help="Log the time and memory used by each stage, and the requests"),
+) -> None:
+    """Serve an HTTP API to profile files and map their columns, keeping the model and VectorDB loaded"""
+    from csvw_ontomap.server import serve  # noqa: PLC0415
+
+    if stats:
+        log.setLevel(logging.DEBUG)
+    config = OntomapConfig(
+        comment_best_matches=best_matches,
+        profiling_engine=engine,
+        embedding_model=embedding_model,
+        quantization=quantization,
+        vectors_on_disk=vectors_on_disk,
+        vectordb_url=vectordb_url if vectordb_url else "",
     )
-    profiler = CsvwProfiler(ontologies, vectordb, config)
-    report = profiler.profile_files(files)
-    if output:
-        if verbose:
-            print(f"Writing to file {BOLD}{CYAN}{output}{END}")
-        with open(output, "w") as file:
-            file.write(json.dumps(report, indent=2))
-    else:
-        print(json.dumps(report, indent=2))
+    serve(host, port, ontologies, vectordb, config, refresh, jobs)
 
 
 # @cli.command("version")
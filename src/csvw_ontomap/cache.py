@@ -0,0 +1,251 @@
+"""Persistent caches of the embeddings, stored next to the VectorDB, and of the profiled tables."""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import unicodedata
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+DEFAULT_EMBEDDING_CACHE_SIZE = 1_000_000
+EMBEDDINGS_FOLDER = "ontomap-embeddings"
+# Maximum number of keys sent in one SQL query
+SQL_BATCH_SIZE = 500
+DEFAULT_PROFILE_CACHE = "data/profile-cache.sqlite"
+
+
+class EmbeddingCache:
+    """Cache of embeddings on disk, keyed by model name and normalized text
+
+    Vectors are stored in a memory-mapped float32 array, and an SQLite index maps each text key to its slot in the
+    array. When the cache reaches its maximum size the least recently used embeddings are evicted.
+    """
+
+    def __init__(self, cache_dir: str, model_name: str, max_size: int = DEFAULT_EMBEDDING_CACHE_SIZE) -> None:
+        self.model_name = model_name
+        self.max_size = max_size
+        self.cache_dir = os.path.join(cache_dir, re.sub(r"[^\w.-]", "_", model_name))
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.vectors_path = os.path.join(self.cache_dir, "vectors.f32")
+        self.index = sqlite3.connect(os.path.join(self.cache_dir, "index.sqlite"), check_same_thread=False)
+        self.index.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, slot INTEGER NOT NULL, last_used INTEGER NOT NULL)"
+        )
+        self.index.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self.index.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self.index.commit()
+        self.dim: Optional[int] = self.get_meta("dim")
+        self.clock = self.get_meta("clock") or 0
+        self.vectors: Optional[np.memmap] = None
+        self.hits = 0
+        self.misses = 0
+
+    def get_meta(self, name: str) -> Optional[int]:
+        row = self.index.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return int(row[0]) if row else None
+
+    def set_meta(self, name: str, value: int) -> None:
+        self.index.execute("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (name, value))
+
+    def open_vectors(self, min_capacity: int = 0) -> np.memmap:
+        """Open the memory-mapped vectors array, growing the file if it is smaller than `min_capacity` vectors"""
+        if self.dim is None:
+            raise ValueError("The dimension of the embeddings is not known before storing the first embeddings")
+        row_size = self.dim * np.dtype(np.float32).itemsize
+        capacity = os.path.getsize(self.vectors_path) // row_size if os.path.exists(self.vectors_path) else 0
+        if capacity < min_capacity:
+            capacity = min(max(min_capacity, capacity * 2, 1024), max(self.max_size, min_capacity))
+            with open(self.vectors_path, "ab") as file:
+                file.truncate(capacity * row_size)
+            self.vectors = None
+        if self.vectors is None or self.vectors.shape[0] != capacity:
+            self.vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+        return self.vectors
+
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Get the cached embeddings of a list of texts, None for texts not in the cache"""
+        keys = [self.get_key(text) for text in texts]
+        slots: Dict[str, int] = {}
+        for i in range(0, len(keys), SQL_BATCH_SIZE):
+            batch = keys[i : i + SQL_BATCH_SIZE]
+            query = f"SELECT key, slot FROM embeddings WHERE key IN ({','.join('?' * len(batch))})"  # noqa: S608
+            slots.update(self.index.execute(query, batch).fetchall())
+        if slots:
+            # Mark the embeddings found as recently used
+            self.clock += 1
+            self.index.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE key = ?", [(self.clock, key) for key in slots]
+            )
+            self.set_meta("clock", self.clock)
+            self.index.commit()
+        vectors = self.open_vectors() if slots else None
+        results: List[Optional[np.ndarray]] = []
+        for key in keys:
+            slot = slots.get(key)
+            results.append(np.array(vectors[slot]) if vectors is not None and slot is not None else None)
+        self.hits += sum(1 for result in results if result is not None)
+        self.misses += sum(1 for result in results if result is None)
+        return results
+
+    def put_many(self, texts: List[str], embeddings: Iterable[Any]) -> None:
+        """Store the embeddings of a list of texts, evicting the least recently used embeddings if the cache is full"""
+        embeddings = list(embeddings)
+        if len(texts) > SQL_BATCH_SIZE:
+            for i in range(0, len(texts), SQL_BATCH_SIZE):
+                self.put_many(texts[i : i + SQL_BATCH_SIZE], embeddings[i : i + SQL_BATCH_SIZE])
+            return
+        entries = dict(zip((self.get_key(text) for text in texts), embeddings))
+        entries = dict(list(entries.items())[-self.max_size :]) if self.max_size > 0 else {}
+        if not entries:
+            return
+        if self.dim is None:
+            self.dim = len(next(iter(entries.values())))
+            self.set_meta("dim", self.dim)
+        # Replace the embeddings already cached in their slot
+        placeholders = ",".join("?" * len(entries))
+        existing = dict(
+            self.index.execute(
+                f"SELECT key, slot FROM embeddings WHERE key IN ({placeholders})", list(entries)  # noqa: S608
+            ).fetchall()
+        )
+        new_keys = [key for key in entries if key not in existing]
+        count = self.index.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        free_slots: List[int] = []
+        evict_count = count + len(new_keys) - self.max_size
+        if evict_count > 0:
+            evicted = self.index.execute(
+                f"SELECT key, slot FROM embeddings WHERE key NOT IN ({placeholders}) ORDER BY last_used LIMIT ?",  # noqa: S608
+                [*entries, evict_count],
+            ).fetchall()
+            self.index.executemany("DELETE FROM embeddings WHERE key = ?", [(key,) for key, _slot in evicted])
+            free_slots = [slot for _key, slot in evicted]
+        next_slot = self.index.execute("SELECT COALESCE(MAX(slot) + 1, 0) FROM embeddings").fetchone()[0]
+        next_slot = max([next_slot, *(slot + 1 for slot in free_slots)])
+        slots = {**existing}
+        for key in new_keys:
+            if free_slots:
+                slots[key] = free_slots.pop()
+            else:
+                slots[key] = next_slot
+                next_slot += 1
+
+        vectors = self.open_vectors(max(slots.values()) + 1)
+        for key, slot in slots.items():
+            vectors[slot] = np.asarray(entries[key], dtype=np.float32)
+        vectors.flush()
+        self.clock += 1
+        self.index.executemany(
+            "INSERT OR REPLACE INTO embeddings (key, slot, last_used) VALUES (?, ?, ?)",
+            [(key, slot, self.clock) for key, slot in slots.items()],
+        )
+        self.set_meta("clock", self.clock)
+        self.index.commit()
+
+    def get_key(self, text: str) -> str:
+        return hashlib.sha256(normalize_text(text).encode()).hexdigest()
+
+    def __len__(self) -> int:
+        count: int = self.index.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        return count
+
+
+class CachedEmbedding:
+    """Wrap an embedding model to only embed texts that are not already in the embedding cache"""
+
+    def __init__(self, embedding_model: Any, cache: EmbeddingCache) -> None:
+        self.embedding_model = embedding_model
+        self.cache = cache
+        self.model_name = cache.model_name
+
+    def embed(self, texts: Iterable[str], **kwargs: Any) -> List[np.ndarray]:
+        texts = list(texts)
+        cached = self.cache.get_many(texts)
+        missing = list(dict.fromkeys(text for text, embedding in zip(texts, cached) if embedding is None))
+        computed: Dict[str, np.ndarray] = {}
+        if missing:
+            computed = dict(zip(missing, (np.asarray(e) for e in self.embedding_model.embed(missing, **kwargs))))
+            self.cache.put_many(missing, computed.values())
+        return [computed[text] if embedding is None else embedding for text, embedding in zip(texts, cached)]
+
+
+def normalize_text(text: str) -> str:
+    """Normalize unicode and whitespaces of a text, the case is kept since models can be case sensitive"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class ProfileCache:
+    """Cache of the CSVW tables of profiled files, stored in SQLite and keyed by the file path
+
+    A cached table is reused when the size, modification time or content hash of its file did not change, and it was
+    generated with the same key (computed from the profiler config and the ontologies manifests)
+    """
+
+    def __init__(self, cache_path: str = DEFAULT_PROFILE_CACHE) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+        self.db = sqlite3.connect(cache_path, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS tables (path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime REAL NOT NULL, "
+            "sha256 TEXT NOT NULL, key TEXT NOT NULL, csvw_table TEXT NOT NULL)"
+        )
+        self.db.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, files: List[str], key: str) -> Dict[str, Any]:
+        """Get the cached tables of the files that did not change, files changed or not in the cache are omitted"""
+        tables: Dict[str, Any] = {}
+        for file in files:
+            path = os.path.abspath(file)
+            row = self.db.execute(
+                "SELECT size, mtime, sha256, csvw_table FROM tables WHERE path = ? AND key = ?", (path, key)
+            ).fetchone()
+            if row is None or not os.path.isfile(path):
+                continue
+            size, mtime, sha256, csvw_table = row
+            stat = os.stat(path)
+            if (size, mtime) != (stat.st_size, stat.st_mtime):
+                # Only compute the hash of the file if its size or modification time changed
+                if sha256 != get_file_hash(path):
+                    continue
+                self.db.execute(
+                    "UPDATE tables SET size = ?, mtime = ? WHERE path = ?", (stat.st_size, stat.st_mtime, path)
+                )
+            tables[file] = {**json.loads(csvw_table), "url": file}
+        self.db.commit()
+        self.hits += len(tables)
+        self.misses += len(files) - len(tables)
+        return tables
+
+    def put_many(self, tables: Dict[str, Any], key: str) -> None:
+        """Store the tables generated for files, replacing the previous table of each file"""
+        rows = []
+        for file, table in tables.items():
+            path = os.path.abspath(file)
+            stat = os.stat(path)
+            rows.append((path, stat.st_size, stat.st_mtime, get_file_hash(path), key, json.dumps(table)))
+        self.db.executemany(
+            "INSERT OR REPLACE INTO tables (path, size, mtime, sha256, key, csvw_table) VALUES (?, ?, ?, ?, ?, ?)", rows
+        )
+        self.db.commit()
+
+    def prune(self) -> int:
+        """Remove the tables of files that do not exist anymore, returns the number of tables removed"""
+        stale = [(path,) for (path,) in self.db.execute("SELECT path FROM tables") if not os.path.isfile(path)]
+        self.db.executemany("DELETE FROM tables WHERE path = ?", stale)
+        self.db.commit()
+        return len(stale)
+
+    def __len__(self) -> int:
+        count: int = self.db.execute("SELECT COUNT(*) FROM tables").fetchone()[0]
+        return count
+
+
+def get_file_hash(file_path: str) -> str:
+    """Get the sha256 hash of a file content, reading it by blocks"""
+    file_hash = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            file_hash.update(block)
+    return file_hash.hexdigest()
@@ -0,0 +1,127 @@
+"""Profiling engines extracting the statistics used to build the CSVW columns datatypes.
+
+Each engine returns a dict of variables reports in the format of the ydata-profiling JSON report,
+only the `type`, `min`, `max` and `value_counts_index_sorted` fields are used to build the CSVW columns.
+"""
+import json
+from typing import Any, Dict
+
+import pandas as pd
+from pandas.api import types as pdt
+
+PROFILING_ENGINES = ["full", "fast"]
+
+# Thresholds and mappings used by ydata-profiling to infer the variables types
+BOOL_MAPPINGS = {
+    "t": True,
+    "f": False,
+    "yes": True,
+    "no": False,
+    "y": True,
+    "n": False,
+    "true": True,
+    "false": False,
+}
+NUM_LOW_CATEGORICAL_THRESHOLD = 5
+CAT_CARDINALITY_THRESHOLD = 50
+CAT_PERCENTAGE_THRESHOLD = 0.5
+
+
+def profile_dataframe(df: pd.DataFrame, engine: str = "full") -> Dict[str, Dict[str, Any]]:
+    """Get the report for each variable of a DataFrame using the given profiling engine"""
+    if engine == "full":
+        return profile_dataframe_full(df)
+    if engine == "fast":
+        return profile_dataframe_fast(df)
+    raise ValueError(f"Unknown profiling engine {engine}, available engines: {', '.join(PROFILING_ENGINES)}")
+
+
+def profile_dataframe_full(df: pd.DataFrame) -> Dict[str, Dict[str, Any]]:
+    """Run a full ydata profiling to get the variables report"""
+    # Imported when used, since ydata-profiling takes seconds to import
+    from ydata_profiling import ProfileReport  # noqa: PLC0415
+
+    report = json.loads(ProfileReport(df, title="Profiling Report").to_json())
+    variables: Dict[str, Dict[str, Any]] = report["variables"]
+    return variables
+
+
+def profile_dataframe_fast(df: pd.DataFrame) -> Dict[str, Dict[str, Any]]:
+    """Only compute the statistics required for the CSVW columns, with vectorized pandas operations per column"""
+    return {str(var_name): profile_series_fast(df[var_name]) for var_name in df.columns}
+
+
+def profile_series_fast(series: pd.Series) -> Dict[str, Any]:
+    """Infer the type of a column following ydata-profiling rules, and get its min, max and sorted value counts"""
+    values = series.dropna()
+    if values.empty:
+        return {"type": "Unsupported"}
+
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return categorical_report(values)
+
+    if pdt.is_bool_dtype(values) or (pdt.is_object_dtype(values) and values.isin({True, False}).all()):
+        return boolean_report(values.astype(bool))
+
+    if pdt.is_datetime64_any_dtype(values):
+        return {"type": "DateTime"}
+
+    if not pdt.is_numeric_dtype(values) and is_string_series(values):
+        lowered = values.str.lower()
+        if lowered.isin(BOOL_MAPPINGS.keys()).all():
+            return boolean_report(lowered.map(BOOL_MAPPINGS).astype(bool))
+        n_unique = values.nunique()
+        try:
+            numeric_values = pd.to_numeric(values)
+        except (TypeError, ValueError):
+            if n_unique <= CAT_CARDINALITY_THRESHOLD and n_unique / values.size < CAT_PERCENTAGE_THRESHOLD:
+                return categorical_report(values)
+            return {"type": "Text"}
+        # Numeric strings with few distinct values stay categorical strings
+        if n_unique <= NUM_LOW_CATEGORICAL_THRESHOLD:
+            return categorical_report(values)
+        values = numeric_values
+
+    if pdt.is_numeric_dtype(values):
+        if values.nunique() <= NUM_LOW_CATEGORICAL_THRESHOLD:
+            return categorical_report(values)
+        return {
+            "type": "Numeric",
+            "min": values.min().item(),
+            "max": values.max().item(),
+            "value_counts_index_sorted": sorted_value_counts(values),
+        }
+    return {"type": "Unsupported"}
+
+
+def is_string_series(values: pd.Series) -> bool:
+    """Check if a series without nulls only contains strings"""
+    if not pdt.is_string_dtype(values) or not all(isinstance(v, str) for v in values.values[0:5]):
+        return False
+    try:
+        return bool((values.astype(str).values == values.values).all())
+    except (TypeError, ValueError):
+        return False
+
+
+def categorical_report(values: pd.Series) -> Dict[str, Any]:
+    """Report for categorical variables, values are compared as strings"""
+    return {"type": "Categorical", "value_counts_index_sorted": sorted_value_counts(values.astype(str))}
+
+
+def boolean_report(values: pd.Series) -> Dict[str, Any]:
+    """Report for boolean variables, values are serialized as JSON booleans"""
+    return {"type": "Boolean", "value_counts_index_sorted": sorted_value_counts(values)}
+
+
+def sorted_value_counts(values: pd.Series) -> Dict[str, int]:
+    """Get the values counts sorted by value, with keys serialized as in the ydata JSON report"""
+    counts = values.value_counts().sort_index()
+    return {json_key(value): int(count) for value, count in zip(counts.index.tolist(), counts.tolist())}
+
+
+def json_key(value: Any) -> str:
+    """Serialize a value as a JSON object key"""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
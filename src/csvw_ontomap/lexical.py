@@ -0,0 +1,80 @@
+"""In-memory index of ontology labels to match columns lexically before using vector search."""
+import re
+from dataclasses import dataclass
+from typing import Any, Collection, Dict, List, Optional, Set
+
+from csvw_ontomap.utils import separate_words
+
+DESCRIPTION_PREDICATES = {
+    "http://www.w3.org/2004/02/skos/core#definition",
+    "http://www.w3.org/2000/01/rdf-schema#comment",
+    "http://purl.org/dc/terms/description",
+}
+NEAR_EXACT_SCORE = 0.95
+
+
+@dataclass
+class TermMatch:
+    """An ontology term matching a search query"""
+
+    score: float
+    payload: Dict[str, Any]
+    source: str
+    """Path that produced the match: exact, near-exact (same words in another order) or vector"""
+
+
+class LabelIndex:
+    """Index ontology terms by normalized label, and by set of words, to resolve exact and near-exact matches"""
+
+    def __init__(self) -> None:
+        self.exact: Dict[str, List[Dict[str, Any]]] = {}
+        self.words: Dict[str, List[Dict[str, Any]]] = {}
+
+    def add(self, payload: Dict[str, Any]) -> None:
+        tokens = tokenize(payload["label"])
+        if not tokens:
+            return
+        self.exact.setdefault(" ".join(tokens), []).append(payload)
+        self.words.setdefault(" ".join(sorted(set(tokens))), []).append(payload)
+
+    def search(self, query: str, limit: int = 3, term_types: Optional[Collection[str]] = None) -> List[TermMatch]:
+        """Get the terms with a label equal to the query after normalization, or with the same set of words
+
+        Only terms of the given types are returned, if any
+        """
+        tokens = tokenize(query)
+        matches: List[TermMatch] = []
+        seen: Set[str] = set()
+        candidates = [(payload, "exact", 1.0) for payload in self.exact.get(" ".join(tokens), [])]
+        candidates += [
+            (payload, "near-exact", NEAR_EXACT_SCORE) for payload in self.words.get(" ".join(sorted(set(tokens))), [])
+        ]
+        for payload, source, score in candidates:
+            if term_types and payload["type"] not in term_types:
+                continue
+            if payload["id"] not in seen and len(matches) < limit:
+                seen.add(payload["id"])
+                matches.append(TermMatch(score, payload, source))
+        return matches
+
+    def __len__(self) -> int:
+        return sum(len(payloads) for payloads in self.exact.values())
+
+
+def get_lexical_predicates(label_predicates: List[str]) -> List[str]:
+    """Get the label predicates matched lexically, the descriptions are too long to match a column name"""
+    return [predicate for predicate in label_predicates if predicate not in DESCRIPTION_PREDICATES]
+
+
+def tokenize(text: str) -> List[str]:
+    """Normalize a label to a list of lowercase words, without punctuation"""
+    return re.sub(r"[\W_]+", " ", separate_words(text)).lower().split()
+
+
+def lexical_score(query: str, label: str) -> float:
+    """Jaccard similarity between the words of a query and a label"""
+    query_words = set(tokenize(query))
+    label_words = set(tokenize(label))
+    if not query_words or not label_words:
+        return 0.0
+    return len(query_words & label_words) / len(query_words | label_words)
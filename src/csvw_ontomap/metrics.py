@@ -0,0 +1,97 @@
+"""Timing and memory metrics of the stages of profiling and ontology loading."""
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Tuple
+
+from csvw_ontomap.utils import BOLD, END, ONTOMAP_NAMESPACE, log
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    # Not available on Windows, the peak memory is not reported
+    resource = None  # type: ignore
+
+METRICS_PROPERTY = f"{ONTOMAP_NAMESPACE}metrics"
+# Memory measures, the maximum over the runs of a stage is kept instead of the sum
+MAX_KEYS = {"peak_rss_increase_mb", "process_peak_rss_mb"}
+
+
+class Metrics:
+    """Accumulate the wall time, counters (rows, columns, embeddings...) and peak memory of each stage of a run
+
+    The memory of a stage is how much it raised the peak resident memory of the process (0 when it stayed under a
+    previous peak), and the peak of the process when it ended.
+    Stages can be recorded from several threads, and stages recorded in other processes can be merged
+    """
+
+    def __init__(self) -> None:
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str, **counters: Any) -> Iterator[Dict[str, Any]]:
+        """Time a stage, the counters of the stage can be updated in the yielded dict"""
+        stage_counters: Dict[str, Any] = dict(counters)
+        start_peak_rss = get_peak_rss_mb()
+        start = time.perf_counter()
+        try:
+            yield stage_counters
+        finally:
+            self.record(name, time.perf_counter() - start, get_peak_rss_mb() - start_peak_rss, **stage_counters)
+
+    def record(self, name: str, seconds: float, peak_rss_increase: float = 0.0, **counters: Any) -> None:
+        """Add the time, memory and counters of a run of a stage, logged at the debug level (enabled by `--stats`)"""
+        memory = {"peak_rss_increase_mb": peak_rss_increase, "process_peak_rss_mb": get_peak_rss_mb()}
+        with self.lock:
+            self.merge({name: {"calls": 1, "seconds": seconds, **counters, **memory}})
+        log.debug(f"⏱️  {name} took {seconds:.3f}s {counters}")
+
+    def merge(self, stages: Dict[str, Dict[str, Any]]) -> None:
+        """Merge the stages recorded by another Metrics, e.g. in a worker process"""
+        for name, other in stages.items():
+            stage = self.stages.setdefault(name, {"calls": 0, "seconds": 0.0})
+            for key, value in other.items():
+                if key in MAX_KEYS:
+                    stage[key] = max(stage.get(key, 0.0), value)
+                else:
+                    stage[key] = stage.get(key, 0) + value
+
+    def to_dict(self) -> Dict[str, Dict[str, Any]]:
+        with self.lock:
+            return {
+                name: {key: round(value, 3) if isinstance(value, float) else value for key, value in stage.items()}
+                for name, stage in self.stages.items()
+            }
+
+    def summary(self) -> str:
+        """Format the metrics of each stage as a table"""
+        stages = self.to_dict()
+        keys = list(dict.fromkeys(key for stage in stages.values() for key in stage))
+        # Show the memory in the last column
+        keys = sorted(keys, key=lambda key: key in MAX_KEYS)
+        rows = [["stage", *keys]] + [
+            [name, *(str(stage.get(key, "")) for key in keys)] for name, stage in stages.items()
+        ]
+        widths = [max(len(row[i]) for row in rows) for i in range(len(keys) + 1)]
+        lines = [
+            "  ".join([row[0].ljust(widths[0]), *(cell.rjust(width) for cell, width in zip(row[1:], widths[1:]))])
+            for row in rows
+        ]
+        return "\n".join([f"{BOLD}{lines[0]}{END}", *lines[1:]])
+
+
+def get_peak_rss_mb() -> float:
+    """Get the peak resident memory of this process in MB"""
+    if resource is None:
+        return 0.0
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS, and in kilobytes on Linux
+    return float(peak_rss / (1024 * 1024) if sys.platform == "darwin" else peak_rss / 1024)
+
+
+def get_cache_counts(embedding_model: Any) -> Tuple[int, int]:
+    """Get the number of hits and misses of the embedding cache of a model, if it is cached"""
+    cache = getattr(embedding_model, "cache", None)
+    return (cache.hits, cache.misses) if cache is not None else (0, 0)
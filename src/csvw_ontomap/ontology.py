@@ -1,47 +1,347 @@
 """Load and search an ontology with a vectordb."""
-from typing import Any, Iterable, List
+import hashlib
+import json
+import os
+import shutil
+import time
+import urllib.request
+import uuid
+import warnings
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
 
 from fastembed.embedding import FlagEmbedding as Embedding
 from qdrant_client import QdrantClient
 from qdrant_client.http.models import (
+    CompressionRatio,
+    Disabled,
     Distance,
     FieldCondition,
     Filter,
-    MatchText,
+    FilterSelector,
+    MatchAny,
+    MatchValue,
+    PayloadSchemaType,
+    PointIdsList,
     PointStruct,
+    ProductQuantization,
+    ProductQuantizationConfig,
+    QuantizationSearchParams,
+    QueryRequest,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    SearchParams,
     VectorParams,
+    VectorParamsDiff,
 )
-from rdflib import Graph
+from rdflib import OWL, RDF, Graph, URIRef
 
-from csvw_ontomap.utils import BOLD, CYAN, END
+from csvw_ontomap.cache import (
+    DEFAULT_EMBEDDING_CACHE_SIZE,
+    EMBEDDINGS_FOLDER,
+    CachedEmbedding,
+    EmbeddingCache,
+    get_file_hash,
+)
+from csvw_ontomap.lexical import LabelIndex, TermMatch, get_lexical_predicates, lexical_score
+from csvw_ontomap.metrics import Metrics, get_cache_counts
+from csvw_ontomap.utils import BOLD, CYAN, DEFAULT_EMBEDDING_MODEL, END, TERM_LABEL_PREDICATES, batched
 
-EMBEDDING_MODEL_NAME = "BAAI/bge-base-en"
+EMBEDDING_MODEL_NAME = DEFAULT_EMBEDDING_MODEL
 EMBEDDING_MODEL_SIZE = 768
+QUANTIZATIONS = ["none", "scalar", "product"]
+# Number of candidates retrieved with quantized vectors for each match, and rescored with the original vectors
+QUANTIZATION_OVERSAMPLING = 2.0
 
 COLLECTION_NAME = "csvw-ontomap"
+SEARCH_BATCH_SIZE = 256
+EMBED_BATCH_SIZE = 256
+MANIFESTS_FOLDER = "ontomap-manifests"
+TERM_TYPES = [OWL.Class, OWL.DatatypeProperty, OWL.ObjectProperty]
+# Groups of term types that the searches can be limited to
+TERM_TYPE_GROUPS = {"class": [str(OWL.Class)], "property": [str(OWL.DatatypeProperty), str(OWL.ObjectProperty)]}
+
+
+class TermLabel(NamedTuple):
+    """A label of an ontology term"""
+
+    uri: URIRef
+    pred: URIRef
+    label: Any
+    type: URIRef
+
+
+class OntologySearcher:
+    """Keep the embedding model and the VectorDB client loaded to search ontology terms for many columns"""
+
+    def __init__(
+        self,
+        vectordb_path: str,
+        embedding_model: Optional[Any] = None,
+        cache_size: int = DEFAULT_EMBEDDING_CACHE_SIZE,
+        metrics: Optional[Metrics] = None,
+        model_name: str = EMBEDDING_MODEL_NAME,
+        quantization: str = "none",
+        on_disk: bool = False,
+        vectordb_url: str = "",
+    ) -> None:
+        """The vectors are stored in a local VectorDB at `vectordb_path`, or in a Qdrant server at `vectordb_url`
+
+        The manifests of the ontologies and the embedding cache are always stored in the `vectordb_path` folder.
+        Quantization and on-disk vectors are only used by Qdrant servers, the local VectorDB keeps full vectors in memory
+        """
+        self.vectordb_path = vectordb_path
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.embedding_model = load_embedding_model(vectordb_path, embedding_model, cache_size, model_name)
+        self.vectordb = get_vectordb_client(vectordb_path, vectordb_url)
+        self.quantization = quantization
+        self.on_disk = on_disk
+        self.search_params = (
+            SearchParams(quantization=QuantizationSearchParams(rescore=True, oversampling=QUANTIZATION_OVERSAMPLING))
+            if vectordb_url and quantization != "none"
+            else None
+        )
+        self.label_index: Optional[LabelIndex] = None
+        self.ontologies: List[str] = []
+        self.label_predicates: List[str] = TERM_LABEL_PREDICATES
+
+    def load(
+        self,
+        ontologies: List[str],
+        recreate: bool = False,
+        refresh: bool = False,
+        label_predicates: Optional[List[str]] = None,
+        ingest_workers: int = 1,
+    ) -> None:
+        """Load ontologies in the VectorDB, reusing the searcher model and client
+
+        Their labels are indexed for lexical matching on the first search
+        """
+        load_vectordb(
+            ontologies,
+            self.vectordb_path,
+            recreate,
+            self.vectordb,
+            self.embedding_model,
+            refresh,
+            label_predicates,
+            ingest_workers,
+            self.metrics,
+            self.quantization,
+            self.on_disk,
+        )
+        self.label_index = None
+        self.ontologies = ontologies
+        self.label_predicates = label_predicates if label_predicates else TERM_LABEL_PREDICATES
+
+    def get_label_index(self) -> LabelIndex:
+        """Get the index of the labels of the loaded ontologies, built from the VectorDB when first used"""
+        if self.label_index is None:
+            with self.metrics.stage("index_labels", ontologies=len(self.ontologies)) as counters:
+                self.label_index = build_label_index(self.vectordb, self.ontologies, self.label_predicates)
+                counters["labels"] = len(self.label_index)
+        return self.label_index
+
+    def get_manifests_hash(self) -> str:
+        """Get a hash of the manifests of the loaded ontologies, which changes when any of them is reindexed"""
+        manifests = [read_manifest(get_manifest_path(self.vectordb_path, onto)) for onto in sorted(self.ontologies)]
+        return hashlib.sha256(json.dumps(manifests, sort_keys=True).encode()).hexdigest()
 
+    def search(
+        self,
+        search_queries: List[str],
+        limit: int = 3,
+        lexical_match: bool = True,
+        lexical_weight: float = 0.3,
+        term_types: Optional[List[str]] = None,
+    ) -> List[List[TermMatch]]:
+        """Search matching entities for a list of queries
 
-def load_vectordb(ontologies: List[str], vectordb_path: str, recreate: bool = False) -> None:
-    # Initialize FastEmbed and Qdrant Client
-    print("📥 Loading embedding model")
-    embedding_model = Embedding(model_name=EMBEDDING_MODEL_NAME, max_length=512)
-    vectordb = QdrantClient(path=vectordb_path)
+        Only the terms of the ontologies loaded by this searcher are searched, and of the given `term_types` if any
+        (URIs of types, or "class" and "property"), using filters on indexed payload fields.
 
+        Queries matching exactly a label of the loaded ontologies (after normalization) are resolved without embedding.
+        Other queries are embedded together and sent as batch vector searches, and their matches are scored with
+        the vector similarity weighted with the words overlap between the query and the label.
+        """
+        if limit <= 0:
+            limit = 3
+        type_uris = resolve_term_types(term_types) if term_types else []
+        query_filter = search_filter(self.ontologies, type_uris)
+        results: List[List[TermMatch]] = [[] for _ in search_queries]
+        label_index = self.get_label_index() if lexical_match and self.ontologies else None
+        if label_index:
+            with self.metrics.stage("lexical_match", queries=len(search_queries)) as counters:
+                results = [label_index.search(query, limit, type_uris) for query in search_queries]
+                counters["matched"] = sum(1 for matches in results if matches)
+        vector_queries = [i for i, matches in enumerate(results) if not matches]
+        for batch in batched(vector_queries, SEARCH_BATCH_SIZE):
+            with self.metrics.stage("embed_queries", queries=len(batch)) as counters:
+                hits, misses = get_cache_counts(self.embedding_model)
+                query_embeddings = list(self.embedding_model.embed([search_queries[i] for i in batch]))
+                counters.update(embedding_counters(self.embedding_model, len(batch), hits, misses))
+            with self.metrics.stage("vector_search", queries=len(batch)):
+                responses = self.vectordb.query_batch_points(
+                    collection_name=COLLECTION_NAME,
+                    requests=[
+                        QueryRequest(
+                            query=embedding.tolist(),
+                            filter=query_filter,
+                            limit=limit,
+                            params=self.search_params,
+                            with_payload=True,
+                        )
+                        for embedding in query_embeddings
+                    ],
+                )
+            for i, response in zip(batch, responses):
+                matches = []
+                for hit in response.points:
+                    payload = hit.payload or {}
+                    score = (1 - lexical_weight) * hit.score + lexical_weight * lexical_score(
+                        search_queries[i], payload.get("label", "")
+                    )
+                    matches.append(TermMatch(score, payload, "vector"))
+                results[i] = sorted(matches, key=lambda match: match.score, reverse=True)
+        return results
+
+
+def load_vectordb(
+    ontologies: List[str],
+    vectordb_path: str,
+    recreate: bool = False,
+    vectordb: Optional[Any] = None,
+    embedding_model: Optional[Any] = None,
+    refresh: bool = False,
+    label_predicates: Optional[List[str]] = None,
+    ingest_workers: int = 1,
+    metrics: Optional[Metrics] = None,
+    quantization: str = "none",
+    on_disk: bool = False,
+) -> None:
+    """Load ontologies classes and properties labels embeddings in the VectorDB
+
+    Ontologies unchanged since they were last indexed (according to their manifest) are skipped without being parsed,
+    use `refresh` to force reloading them. Labels are the values of the `label_predicates` of each term
+
+    With `ingest_workers` > 1, this number of ontologies are downloaded and parsed at the same time, and their labels
+    are embedded in a pool of processes. The embeddings are uploaded to the VectorDB by batches from this process
+
+    The collection is created with the size of the embeddings of the model, and with `quantization` (none, scalar or
+    product) and `on_disk` vectors. It is recreated when the size of the embeddings changes
+    """
+    label_predicates = label_predicates if label_predicates else TERM_LABEL_PREDICATES
+    metrics = metrics if metrics is not None else Metrics()
+    # Initialize FastEmbed and Qdrant Client, if not provided
+    if embedding_model is None:
+        embedding_model = load_embedding_model(vectordb_path)
+    if vectordb is None:
+        vectordb = QdrantClient(path=vectordb_path)
+    model_name = get_model_name(embedding_model)
+    vectors_size = get_embedding_size(embedding_model)
+    quantization_config = get_quantization_config(quantization)
+
+    collection_config: Any = None
     try:
-        print(f"Total vectors in DB: {vectordb.get_collection(COLLECTION_NAME).points_count}")
+        collection = vectordb.get_collection(COLLECTION_NAME)
+        print(f"Total vectors in DB: {collection.points_count}")
+        collection_config = collection.config
+        if collection_config.params.vectors.size != vectors_size:
+            print(f"📐 The size of the embeddings of {model_name} ({vectors_size}) is different from the VectorDB")
+            recreate = True
     except:
         recreate = True
 
     if recreate:
         print(f"🔄 Recreating VectorDB in {vectordb_path}")
+        shutil.rmtree(os.path.join(vectordb_path, MANIFESTS_FOLDER), ignore_errors=True)
         vectordb.recreate_collection(
             collection_name=COLLECTION_NAME,
-            vectors_config=VectorParams(size=EMBEDDING_MODEL_SIZE, distance=Distance.COSINE),
+            vectors_config=VectorParams(size=vectors_size, distance=Distance.COSINE, on_disk=on_disk),
+            quantization_config=quantization_config,
         )
+    elif (
+        bool(collection_config.params.vectors.on_disk) != on_disk
+        or collection_config.quantization_config != quantization_config
+    ):
+        # Changing the storage of the vectors does not change their values, they do not need to be embedded again
+        vectordb.update_collection(
+            collection_name=COLLECTION_NAME,
+            vectors_config={"": VectorParamsDiff(on_disk=on_disk)},
+            quantization_config=quantization_config if quantization_config else Disabled.DISABLED,
+        )
+    with warnings.catch_warnings():
+        # Payload indexes are only used by Qdrant server, the local Qdrant warns they have no effect
+        warnings.simplefilter("ignore", UserWarning)
+        vectordb.create_payload_index(COLLECTION_NAME, "ontology", PayloadSchemaType.KEYWORD)
+        vectordb.create_payload_index(COLLECTION_NAME, "type", PayloadSchemaType.KEYWORD)
 
+    sources: Dict[str, Dict[str, Any]] = {}
     for ontology_url in ontologies:
-        print(f"\n📚 Loading ontology from {BOLD}{CYAN}{ontology_url}{END}")
+        manifest_path = get_manifest_path(vectordb_path, ontology_url)
+        source = get_source_info(ontology_url)
+        manifest = read_manifest(manifest_path)
+        if not refresh and manifest_matches(manifest, ontology_url, source, vectordb, label_predicates, model_name):
+            print(f"⏩ Skip loading {BOLD}{CYAN}{ontology_url}{END}, the ontology did not change since it was indexed")
+            continue
+        if refresh or (manifest and manifest.get("embedding_model") != model_name):
+            # A refresh is forced, or the embedding model changed: remove all previous vectors before reloading it
+            vectordb.delete(
+                collection_name=COLLECTION_NAME,
+                points_selector=FilterSelector(filter=ontology_filter(ontology_url)),
+            )
+        sources[ontology_url] = source
+    if not sources:
+        return
 
+    batch_size = EMBED_BATCH_SIZE
+    if ingest_workers > 1:
+        # Embed the labels in a pool of processes, the embeddings are uploaded by this process
+        embedding_model = load_pool_embedding_model(embedding_model, ingest_workers)
+        batch_size = EMBED_BATCH_SIZE * ingest_workers
+    try:
+        for ontology_url, g in parse_ontologies(list(sources), ingest_workers, metrics):
+            print(f"\n📚 Indexing ontology from {BOLD}{CYAN}{ontology_url}{END}")
+            # Only new or changed labels are embedded, and removed labels are deleted from the VectorDB
+            existing_ids = get_onto_point_ids(vectordb, ontology_url)
+            print(f"{BOLD}{len(existing_ids)}{END} vectors loaded in the VectorDB")
+            # Extract the terms and their labels in one pass over the graph, counting the terms while streaming them
+            term_uris: Set[str] = set()
+            onto_ids = embed_labels(
+                extract_terms(g, label_predicates, term_uris),
+                "classes and properties",
+                ontology_url,
+                vectordb,
+                embedding_model,
+                existing_ids,
+                batch_size,
+                metrics,
+            )
+            print(f"{BOLD}{len(term_uris)}{END} classes/properties in the ontology")
+
+            removed_ids = existing_ids - onto_ids
+            if removed_ids:
+                print(f"🗑️  Deleting {len(removed_ids)} vectors for labels removed from the ontology")
+                vectordb.delete(collection_name=COLLECTION_NAME, points_selector=PointIdsList(points=list(removed_ids)))
+            write_manifest(
+                get_manifest_path(vectordb_path, ontology_url),
+                ontology_url,
+                sources[ontology_url],
+                get_onto_vectors_count(vectordb, ontology_url),
+                label_predicates,
+                model_name,
+            )
+    finally:
+        shutdown_pool_embedding(embedding_model)
+
+
+def parse_ontology(ontology_url: str, metrics: Optional[Metrics] = None) -> Tuple[str, Graph]:
+    """Download and parse an ontology"""
+    print(f"📥 Parsing ontology from {BOLD}{CYAN}{ontology_url}{END}")
+    metrics = metrics if metrics is not None else Metrics()
+    with metrics.stage("parse_ontology", ontologies=1) as counters:
         # NOTE: We use oxrdflib to handle large ontologies (600M+)
         g = Graph(store="Oxigraph")
         try:
@@ -49,156 +349,391 @@ def load_vectordb(ontologies: List[str], vectordb_path: str, recreate: bool = Fa
         except Exception as e:
             print(f"Default parsing failed, trying with XML parser: {e}")
             g.parse(ontology_url, format="xml")
+        counters["triples"] = len(g)
+    return ontology_url, g
 
-        # For each ontology check if there are more vectors than classes/properties, and skip building if enough vectors for this ontology
-        onto_vector_count = get_onto_vectors_count(vectordb, ontology_url)
-        q_count_cls = """PREFIX xsd: <http://www.w3.org/2001/XMLSchema#>
-        PREFIX rdfs:  <http://www.w3.org/2000/01/rdf-schema#>
-        PREFIX owl:  <http://www.w3.org/2002/07/owl#>
-        SELECT (COUNT(DISTINCT ?uri) as ?clsCount)
-        WHERE {
-            ?uri a ?type .
-            FILTER (
-                ?type = owl:Class ||
-                ?type = owl:DatatypeProperty ||
-                ?type = owl:ObjectProperty
-            )
-        }
-        """
-        all_onto_count = 0
-        results: Iterable[Any] = g.query(q_count_cls)
-        for res in results:
-            all_onto_count = int(res.clsCount)
-            break
-        print(
-            f"{BOLD}{all_onto_count}{END} classes/properties in the ontology | {BOLD}{onto_vector_count}{END} loaded in the VectorDB"
+
+def parse_ontologies(
+    ontologies: List[str], workers: int = 1, metrics: Optional[Metrics] = None
+) -> Iterator[Tuple[str, Graph]]:
+    """Download and parse ontologies in a pool of threads, yielding each graph as soon as it is parsed
+
+    At most `workers` ontologies are parsed at the same time, and the next ontology is only parsed when a graph has
+    been consumed, so the number of graphs in memory stays bounded
+    """
+    if workers <= 1:
+        for url in ontologies:
+            yield parse_ontology(url, metrics)
+        return
+    remaining = iter(ontologies)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = {executor.submit(parse_ontology, url, metrics) for url in islice(remaining, workers)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                pending |= {executor.submit(parse_ontology, url, metrics) for url in islice(remaining, 1)}
+                yield future.result()
+
+
+class PoolEmbedding:
+    """Embed texts in a pool of processes, each worker process holds its own instance of the embedding model"""
+
+    def __init__(self, embedding_model: Any, workers: int) -> None:
+        self.model_name = getattr(embedding_model, "model_name", EMBEDDING_MODEL_NAME)
+        self.workers = workers
+        # FastEmbed models are loaded again in each worker, other models are sent to the workers
+        worker_model = None if isinstance(embedding_model, Embedding) else embedding_model
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers, initializer=init_embedding_worker, initargs=(self.model_name, worker_model)
         )
-        if onto_vector_count > all_onto_count:
-            print("⏩ Skip loading")
-            continue
+        # Start the workers now, before starting the threads parsing ontologies (forking with running threads is unsafe)
+        self.executor.submit(int).result()
 
-        # Get classes labels
-        q_cls_labels = """PREFIX xsd: <http://www.w3.org/2001/XMLSchema#>
-        PREFIX rdfs:  <http://www.w3.org/2000/01/rdf-schema#>
-        PREFIX owl:  <http://www.w3.org/2002/07/owl#>
-        PREFIX skos: <http://www.w3.org/2004/02/skos/core#>
-        PREFIX dc: <http://purl.org/dc/elements/1.1/>
-        PREFIX dcterms: <http://purl.org/dc/terms/>
-
-        SELECT ?uri ?pred ?label ?type
-        WHERE {
-            ?uri a ?type ;
-                ?pred ?label .
-            FILTER (
-                ?type = owl:Class
-            )
-            FILTER (
-                ?pred = rdfs:label ||
-                ?pred = skos:prefLabel ||
-                ?pred = skos:altLabel ||
-                ?pred = skos:definition ||
-                ?pred = rdfs:comment ||
-                ?pred = dcterms:description ||
-                ?pred = dc:title
-            )
-        }
-        """
-        embed_labels(g.query(q_cls_labels), "classes", ontology_url, vectordb, embedding_model)
-
-        # Get properties labels (separated to classes to reduce the size of the queries for big ontologies)
-        q_prop_labels = """PREFIX xsd: <http://www.w3.org/2001/XMLSchema#>
-        PREFIX rdfs:  <http://www.w3.org/2000/01/rdf-schema#>
-        PREFIX owl:  <http://www.w3.org/2002/07/owl#>
-        PREFIX skos: <http://www.w3.org/2004/02/skos/core#>
-        PREFIX dc: <http://purl.org/dc/elements/1.1/>
-        PREFIX dcterms: <http://purl.org/dc/terms/>
-
-        SELECT ?uri ?pred ?label ?type
-        WHERE {
-            ?uri a ?type ;
-                ?pred ?label .
-            FILTER (
-                ?type = owl:DatatypeProperty ||
-                ?type = owl:ObjectProperty
-            )
-            FILTER (
-                ?pred = rdfs:label ||
-                ?pred = skos:prefLabel ||
-                ?pred = skos:altLabel ||
-                ?pred = skos:definition ||
-                ?pred = rdfs:comment ||
-                ?pred = dcterms:description ||
-                ?pred = dc:title
-            )
-        }
-        """
-        embed_labels(g.query(q_prop_labels), "properties", ontology_url, vectordb, embedding_model)
+    def embed(self, texts: Iterable[str], **kwargs: Any) -> List[Any]:
+        texts = list(texts)
+        chunk_size = -(-len(texts) // self.workers)
+        chunks = [texts[i : i + chunk_size] for i in range(0, len(texts), max(chunk_size, 1))]
+        return [embedding for embeddings in self.executor.map(embed_in_worker, chunks) for embedding in embeddings]
 
+    def shutdown(self) -> None:
+        self.executor.shutdown()
 
-def get_onto_vectors_count(vectordb: Any, ontology: str) -> int:
-    """Get vector count for a specific ontology URL"""
-    search_result = vectordb.scroll(
-        collection_name=COLLECTION_NAME,
-        scroll_filter=Filter(should=[FieldCondition(key="ontology", match=MatchText(text=ontology))]),
-        limit=99999999,
-    )
-    return len(list(search_result[0]))
 
+worker_embedding_model: Any = None
 
-def embed_labels(concepts_labels: Any, category: str, ontology_url: str, vectordb: Any, embedding_model: Any) -> None:
-    """Generate and upload embeddings for labels extracted from an ontology"""
-    concept_labels = []
-    concept_uris = []
-    concept_payloads = []
-    # Prepare list of labels to be embedded
-    for cl in concepts_labels:
-        concept_labels.append(str(cl.label))
-        concept_uris.append(str(cl.uri))
-        concept_payloads.append(
-            {
-                "pred": str(cl.pred),
-                "type": str(cl.type),
+
+def init_embedding_worker(model_name: str, embedding_model: Optional[Any] = None) -> None:
+    """Load the embedding model once in each worker process"""
+    global worker_embedding_model  # noqa: PLW0603
+    worker_embedding_model = embedding_model or Embedding(model_name=model_name, max_length=512)
+
+
+def embed_in_worker(texts: List[str]) -> List[Any]:
+    return list(worker_embedding_model.embed(texts))
+
+
+def load_pool_embedding_model(embedding_model: Any, workers: int) -> Any:
+    """Replace the embedding model by a pool of embedding processes, keeping the embedding cache in this process"""
+    if isinstance(embedding_model, CachedEmbedding):
+        return CachedEmbedding(PoolEmbedding(embedding_model.embedding_model, workers), embedding_model.cache)
+    return PoolEmbedding(embedding_model, workers)
+
+
+def shutdown_pool_embedding(embedding_model: Any) -> None:
+    if isinstance(embedding_model, CachedEmbedding):
+        embedding_model = embedding_model.embedding_model
+    if isinstance(embedding_model, PoolEmbedding):
+        embedding_model.shutdown()
+
+
+def load_embedding_model(
+    vectordb_path: str,
+    embedding_model: Optional[Any] = None,
+    cache_size: int = DEFAULT_EMBEDDING_CACHE_SIZE,
+    model_name: str = EMBEDDING_MODEL_NAME,
+) -> Any:
+    """Load the embedding model, and wrap it with the embedding cache stored in the VectorDB folder"""
+    if embedding_model is None:
+        print(f"📥 Loading embedding model {BOLD}{model_name}{END}")
+        embedding_model = Embedding(model_name=model_name, max_length=512)
+    if cache_size <= 0:
+        return embedding_model
+    model_name = get_model_name(embedding_model)
+    cache = EmbeddingCache(os.path.join(vectordb_path, EMBEDDINGS_FOLDER), model_name, cache_size)
+    return CachedEmbedding(embedding_model, cache)
+
+
+def get_model_name(embedding_model: Any) -> str:
+    return str(getattr(embedding_model, "model_name", EMBEDDING_MODEL_NAME))
+
+
+def get_embedding_size(embedding_model: Any) -> int:
+    """Get the size of the embeddings of a model, from the FastEmbed supported models or by embedding a text"""
+    model = embedding_model.embedding_model if isinstance(embedding_model, CachedEmbedding) else embedding_model
+    if getattr(model, "embedding_size", None):
+        return int(model.embedding_size)
+    model_name = get_model_name(embedding_model)
+    for supported_model in Embedding.list_supported_models():
+        if supported_model["model"] == model_name:
+            return int(supported_model["dim"])
+    return len(next(iter(embedding_model.embed(["size"]))))
+
+
+def get_quantization_config(quantization: str) -> Optional[Any]:
+    """Get the Qdrant config of a quantization: scalar (int8, 4x smaller) or product (16x smaller), None for none"""
+    if quantization == "scalar":
+        return ScalarQuantization(scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=True))
+    if quantization == "product":
+        return ProductQuantization(product=ProductQuantizationConfig(compression=CompressionRatio.X16, always_ram=True))
+    if quantization == "none":
+        return None
+    raise ValueError(f"Unknown quantization {quantization}, use one of: {', '.join(QUANTIZATIONS)}")
+
+
+def get_vectordb_client(vectordb_path: str, vectordb_url: str = "") -> QdrantClient:
+    """Connect to a Qdrant server if its URL is provided, otherwise open the local VectorDB"""
+    return QdrantClient(url=vectordb_url) if vectordb_url else QdrantClient(path=vectordb_path)
+
+
+def get_manifest_path(vectordb_path: str, ontology: str) -> str:
+    """Get the path to the manifest of an ontology in the VectorDB folder"""
+    return os.path.join(vectordb_path, MANIFESTS_FOLDER, f"{hashlib.sha256(ontology.encode()).hexdigest()}.json")
+
+
+def get_source_info(ontology: str) -> Dict[str, Any]:
+    """Get size and modification time of a local ontology file, or the HTTP headers of a remote ontology"""
+    if os.path.isfile(ontology):
+        stat = os.stat(ontology)
+        return {"size": stat.st_size, "mtime": stat.st_mtime}
+    try:
+        request = urllib.request.Request(ontology, method="HEAD")  # noqa: S310
+        with urllib.request.urlopen(request, timeout=10) as response:  # noqa: S310
+            return {
+                header.lower(): response.headers[header]
+                for header in ["ETag", "Last-Modified", "Content-Length"]
+                if response.headers.get(header)
             }
-        )
-    concepts_count = len(set(concept_uris))
-    print(f"⏳ Generating {len(concept_uris)} embeddings for {concepts_count} {category}")
-
-    # Generate embeddings, and upload them
-    embeddings = list(embedding_model.embed(concept_labels))
-    points_count: int = vectordb.get_collection(COLLECTION_NAME).points_count
-    class_points = [
-        PointStruct(
-            id=points_count + i,
-            vector=embedding,
-            payload={
-                "id": uri,
-                "label": label,
-                "type": payload["type"],
-                "ontology": ontology_url,
-                "predicate": payload["pred"],
+    except Exception:
+        return {}
+
+
+def read_manifest(manifest_path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(manifest_path) as file:
+            manifest: Dict[str, Any] = json.load(file)
+            return manifest
+    except (OSError, ValueError):
+        return None
+
+
+def write_manifest(
+    manifest_path: str,
+    ontology: str,
+    source: Dict[str, Any],
+    vectors_count: int,
+    label_predicates: List[str],
+    model_name: str = EMBEDDING_MODEL_NAME,
+) -> None:
+    """Store the source info, content hash, embedding model, label predicates and vectors count of an indexed ontology"""
+    if os.path.isfile(ontology):
+        source = {**source, "sha256": get_file_hash(ontology)}
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    with open(manifest_path, "w") as file:
+        json.dump(
+            {
+                "ontology": ontology,
+                "source": source,
+                "embedding_model": model_name,
+                "label_predicates": sorted(label_predicates),
+                "vectors_count": vectors_count,
             },
+            file,
+            indent=2,
         )
-        for i, (uri, label, payload, embedding) in enumerate(
-            zip(concept_uris, concept_labels, concept_payloads, embeddings)
+
+
+def manifest_matches(
+    manifest: Optional[Dict[str, Any]],
+    ontology: str,
+    source: Dict[str, Any],
+    vectordb: Any,
+    label_predicates: List[str],
+    model_name: str = EMBEDDING_MODEL_NAME,
+) -> bool:
+    """Check if an ontology has not changed since its manifest was written, and its vectors are still in the VectorDB"""
+    if not manifest or manifest.get("ontology") != ontology or manifest.get("embedding_model") != model_name:
+        return False
+    if manifest.get("label_predicates") != sorted(label_predicates):
+        return False
+    indexed_source = manifest.get("source", {})
+    if os.path.isfile(ontology):
+        # Only compute the hash of the file if its size or modification time changed
+        unchanged = indexed_source.get("size") == source["size"] and indexed_source.get("mtime") == source["mtime"]
+        if not unchanged and indexed_source.get("sha256") != get_file_hash(ontology):
+            return False
+    elif any(indexed_source.get(key) != value for key, value in source.items() if key in indexed_source):
+        return False
+    return (
+        bool(manifest.get("vectors_count")) and get_onto_vectors_count(vectordb, ontology) == manifest["vectors_count"]
+    )
+
+
+def ontology_filter(ontology: str) -> Filter:
+    """Filter the points of an ontology, with an exact match on the indexed ontology field"""
+    return Filter(must=[FieldCondition(key="ontology", match=MatchValue(value=ontology))])
+
+
+def resolve_term_types(term_types: List[str]) -> List[str]:
+    """Get the URIs of term types, given as URIs or as groups of types: class or property"""
+    return [uri for term_type in term_types for uri in TERM_TYPE_GROUPS.get(term_type, [term_type])]
+
+
+def search_filter(ontologies: List[str], term_types: List[str]) -> Optional[Filter]:
+    """Filter the points of some ontologies and term types on the indexed payload fields, None to search all points"""
+    conditions: List[Any] = []
+    if ontologies:
+        conditions.append(FieldCondition(key="ontology", match=MatchAny(any=ontologies)))
+    if term_types:
+        conditions.append(FieldCondition(key="type", match=MatchAny(any=term_types)))
+    return Filter(must=conditions) if conditions else None
+
+
+def get_onto_vectors_count(vectordb: Any, ontology: str) -> int:
+    """Get vector count for a specific ontology URL"""
+    count: int = vectordb.count(
+        collection_name=COLLECTION_NAME, count_filter=ontology_filter(ontology), exact=True
+    ).count
+    return count
+
+
+def get_onto_point_ids(vectordb: Any, ontology: str) -> Set[str]:
+    """Get the IDs of all points of an ontology, scrolling by pages without loading payloads and vectors"""
+    point_ids: Set[str] = set()
+    offset = None
+    while True:
+        points, offset = vectordb.scroll(
+            collection_name=COLLECTION_NAME,
+            scroll_filter=ontology_filter(ontology),
+            limit=10000,
+            offset=offset,
+            with_payload=False,
+            with_vectors=False,
         )
-    ]
-    # print(f"{BOLD}{len(class_points)}{END} vectors generated for {concepts_count} {category}")
-    vectordb.upsert(collection_name=COLLECTION_NAME, points=class_points)
+        point_ids.update(str(point.id) for point in points)
+        if offset is None:
+            return point_ids
+
+
+def build_label_index(vectordb: Any, ontologies: List[str], label_predicates: List[str]) -> LabelIndex:
+    """Build the in-memory index of the labels of the given ontologies, from the payloads stored in the VectorDB
+
+    Only the labels of the given predicates are indexed, without the descriptions
+    """
+    label_index = LabelIndex()
+    lexical_predicates = get_lexical_predicates(label_predicates)
+    if not lexical_predicates:
+        return label_index
+    scroll_filter = Filter(
+        must=[
+            FieldCondition(key="ontology", match=MatchAny(any=ontologies)),
+            FieldCondition(key="predicate", match=MatchAny(any=lexical_predicates)),
+        ]
+    )
+    offset = None
+    while True:
+        points, offset = vectordb.scroll(
+            collection_name=COLLECTION_NAME,
+            scroll_filter=scroll_filter,
+            limit=10000,
+            offset=offset,
+            with_payload=True,
+            with_vectors=False,
+        )
+        for point in points:
+            label_index.add(point.payload)
+        if offset is None:
+            return label_index
+
+
+def extract_terms(g: Graph, label_predicates: List[str], term_uris: Set[str]) -> Iterator[TermLabel]:
+    """Generate the labels of the classes and properties of an ontology, and add the terms URIs to `term_uris`
 
+    Uses direct triple pattern lookups for each term type and label predicate, instead of SPARQL queries with
+    FILTERs that require to scan the graph, so the graph is traversed once
+    """
+    predicates = [URIRef(pred) for pred in label_predicates]
+    for term_type in TERM_TYPES:
+        for uri in g.subjects(RDF.type, term_type, unique=True):
+            if not isinstance(uri, URIRef):
+                continue
+            term_uris.add(str(uri))
+            for pred in predicates:
+                for label in g.objects(uri, pred):
+                    yield TermLabel(uri, pred, label, term_type)
 
-def search_vectordb(vectordb_path: str, search_query: str, limit: int = 3) -> Any:  # -> Any:
-    """Search matching entities in the vectordb"""
-    if limit <= 0:
-        limit = 3
-    # Initialize FastEmbed and Qdrant Client
-    embedding_model = Embedding(model_name=EMBEDDING_MODEL_NAME, max_length=512)
-    vectordb = QdrantClient(path=vectordb_path)
 
-    query_embeddings = list(embedding_model.embed([search_query]))
+def get_point_id(ontology: str, uri: str, predicate: str, label: str) -> str:
+    """Generate a deterministic point ID for the label of an ontology term"""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, "\n".join([ontology, uri, predicate, label])))
 
-    return vectordb.search(
-        collection_name=COLLECTION_NAME,
-        query_vector=query_embeddings[0],
-        limit=limit,
+
+def embed_labels(
+    concepts_labels: Any,
+    category: str,
+    ontology_url: str,
+    vectordb: Any,
+    embedding_model: Any,
+    existing_ids: Optional[Set[str]] = None,
+    batch_size: int = 0,
+    metrics: Optional[Metrics] = None,
+) -> Set[str]:
+    """Generate and upload embeddings for labels extracted from an ontology
+
+    Labels are streamed from the graph, embedded and uploaded by batches, so the memory used is bounded by the batch
+    size (default to EMBED_BATCH_SIZE). Labels already in the VectorDB (in `existing_ids`) are not embedded again,
+    which enables to resume an interrupted load. Returns the IDs of all labels
+    """
+    existing_ids = existing_ids if existing_ids is not None else set()
+    metrics = metrics if metrics is not None else Metrics()
+    concept_ids: Set[str] = set()
+    print(f"⏳ Generating embeddings for {category}")
+    start_time = time.time()
+    embedded_count = 0
+    batch_size = batch_size if batch_size > 0 else EMBED_BATCH_SIZE
+    for batch in batched(iter_new_points(concepts_labels, ontology_url, existing_ids, concept_ids), batch_size):
+        with metrics.stage("embed_labels", labels=len(batch)) as counters:
+            hits, misses = get_cache_counts(embedding_model)
+            embeddings = list(embedding_model.embed([payload["label"] for _point_id, payload in batch]))
+            counters.update(embedding_counters(embedding_model, len(batch), hits, misses))
+        with metrics.stage("upsert", points=len(batch)):
+            vectordb.upsert(
+                collection_name=COLLECTION_NAME,
+                points=[
+                    PointStruct(id=point_id, vector=embedding, payload=payload)
+                    for (point_id, payload), embedding in zip(batch, embeddings)
+                ],
+            )
+        embedded_count += len(batch)
+        elapsed = time.time() - start_time
+        print(f"\r📤 {embedded_count} embeddings uploaded ({embedded_count / elapsed:.0f}/s)", end="", flush=True)
+    if embedded_count:
+        print()
+    print(
+        f"{BOLD}{embedded_count}{END} embeddings generated for {category} in {time.time() - start_time:.1f}s ({len(concept_ids) - embedded_count} already loaded)"
     )
-    # for hit in hits: print(hit.payload, "score:", hit.score)
+    return concept_ids
+
+
+def embedding_counters(embedding_model: Any, texts_count: int, hits: int, misses: int) -> Dict[str, int]:
+    """Count the embeddings computed and the cache hits since the cache counters were `hits` and `misses`"""
+    new_hits, new_misses = get_cache_counts(embedding_model)
+    if not hasattr(embedding_model, "cache"):
+        return {"embeddings": texts_count, "cache_hits": 0}
+    return {"embeddings": new_misses - misses, "cache_hits": new_hits - hits}
+
+
+def iter_new_points(
+    concepts_labels: Iterable[Any], ontology_url: str, existing_ids: Set[str], concept_ids: Set[str]
+) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Generate the ID and payload of labels not yet in the VectorDB, and add all labels IDs to `concept_ids`"""
+    for cl in concepts_labels:
+        point_id = get_point_id(ontology_url, str(cl.uri), str(cl.pred), str(cl.label))
+        if point_id in concept_ids:
+            continue
+        concept_ids.add(point_id)
+        if point_id not in existing_ids:
+            yield point_id, {
+                "id": str(cl.uri),
+                "label": str(cl.label),
+                "type": str(cl.type),
+                "ontology": ontology_url,
+                "predicate": str(cl.pred),
+            }
+
+
+def search_vectordb(vectordb_path: str, search_query: str, limit: int = 3) -> Any:
+    """Search matching entities in the vectordb
+
+    Loads the embedding model for a single query, use `OntologySearcher` to search many queries
+    """
+    return OntologySearcher(vectordb_path).search([search_query], limit)[0]
@@ -1,15 +1,44 @@
 """CSVW Profile class."""
+import copy
 import glob
+import hashlib
 import json
-import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict
 from datetime import datetime
-from typing import Any, List, Optional
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, TextIO, Tuple, Union
 
 import pandas as pd
-from ydata_profiling import ProfileReport
 
-from csvw_ontomap.ontology import load_vectordb, search_vectordb
-from csvw_ontomap.utils import BOLD, END, YELLOW, OntomapConfig
+from csvw_ontomap import __version__
+from csvw_ontomap.cache import ProfileCache
+from csvw_ontomap.engines import BOOL_MAPPINGS, profile_dataframe
+from csvw_ontomap.metrics import METRICS_PROPERTY, Metrics
+from csvw_ontomap.readers import arrow_min_max, get_dialect, is_arrow_file, read_chunks, read_dataframe
+from csvw_ontomap.streaming import profile_chunks, sample_chunks
+from csvw_ontomap.utils import BOLD, END, ONTOMAP_NAMESPACE, YELLOW, OntomapConfig, batched, separate_words
+from csvw_ontomap.writer import CsvwWriter
+
+if TYPE_CHECKING:
+    from csvw_ontomap.lexical import TermMatch
+    from csvw_ontomap.ontology import OntologySearcher
+
+# Number of rows read at once when sampling a file without chunk size
+SAMPLE_CHUNK_SIZE = 100_000
+SAMPLING_PROPERTY = f"{ONTOMAP_NAMESPACE}sampling"
+# Number of files profiled, mapped and cached together before their tables are returned
+PROFILE_BATCH_SIZE = 100
+# Config fields which do not change the generated tables, ignored in the key of the profile cache
+RUNTIME_CONFIG_FIELDS = [
+    "workers",
+    "ingest_workers",
+    "embedding_cache_size",
+    "report_metrics",
+    "profile_cache",
+    "vectors_on_disk",
+    "vectordb_url",
+]
 
 
 class CsvwProfiler:
@@ -19,153 +48,413 @@ class CsvwProfiler:
         vectordb_path: str = "data/vectordb",
         config: Optional[OntomapConfig] = None,
         recreate: bool = False,
+        refresh: bool = False,
     ) -> None:
-        """Optionally provide an ontology that will be loaded to a vectordb for mapping"""
+        """Optionally provide an ontology that will be loaded to a vectordb for mapping
+
+        Ontologies already indexed are not parsed again if they did not change, unless `refresh` is set
+        """
         self.config = config if config else OntomapConfig()
-        self.csvw: Any = CSVW_BASE
+        # Each profiler gets its own copy of the CSVW metadata, tables are not shared between instances
+        self.csvw: Any = copy.deepcopy(CSVW_BASE)
         self.ontologies = ontologies
         self.vectordb_path = vectordb_path
+        self.searcher: Optional[OntologySearcher] = None
+        # Time and memory used by each stage, accumulated over all the runs of this profiler
+        self.metrics = Metrics()
         if self.ontologies:
-            load_vectordb(self.ontologies, self.vectordb_path, recreate)
+            # The ontology stack (embedding model, VectorDB, RDF parser) is only imported when ontologies are provided
+            from csvw_ontomap import ontology  # noqa: PLC0415
+
+            # Load the embedding model and VectorDB client once, and reuse them for all columns
+            self.searcher = ontology.OntologySearcher(
+                self.vectordb_path,
+                cache_size=self.config.embedding_cache_size,
+                metrics=self.metrics,
+                model_name=self.config.embedding_model,
+                quantization=self.config.quantization,
+                on_disk=self.config.vectors_on_disk,
+                vectordb_url=self.config.vectordb_url,
+            )
+            self.searcher.load(
+                self.ontologies, recreate, refresh, self.config.label_predicates, self.config.ingest_workers
+            )
 
     def profile_files(self, files: List[str], config: Optional[OntomapConfig] = None) -> Any:
         """Profile a list of tabular files by generating report using https://github.com/ydataai/ydata-profiling
 
+        Or using the built-in fast profiling engine when `profiling_engine="fast"` in the config,
+        CSV files are profiled in streaming by chunks when a `chunk_size` is provided in the config
+
         If an ontology is provided it will use it to map the files columns to classes/properties of the ontology
         cf. https://www.w3.org/TR/tabular-data-primer/ for CSVW specs
         Search_threshold is between 0 and 1
         """
         config = config if config else self.config
-        for glob_file in files:
-            file_list = glob.glob(glob_file)
-
-            for file in file_list:
-                print(f"🔍 Profiling {BOLD}{YELLOW}{file}{END}")
-                # Create new CSVW table for each file
-                table: Any = {"url": file, "tableSchema": {"columns": []}}
-
-                # Read file with pandas
-                df: pd.DataFrame
-                if file.endswith(".xlsx"):
-                    df = pd.read_excel(file)
-                elif file.endswith(".spss"):
-                    df = pd.read_spss(file)
-                else:
-                    df = pd.read_csv(file, true_values=["true"], false_values=["false"])
-                    # TODO: handle when TSV or others
-                    # table["dialect"] = {"delimiter": "\t", "headerRowCount": 3}
-
-                # Run ydata profiling to get report
-                report = json.loads(ProfileReport(df, title="Profiling Report").to_json())
-
-                # Create a CSVW column for each variable
-                for var_name, var_report in report["variables"].items():
-                    col = {"titles": var_name, "dc:title": separate_words(var_name)}
-
-                    if self.ontologies:
-                        # Get most matching property or class from the ontology
-                        matches = search_vectordb(self.vectordb_path, col["dc:title"], config.comment_best_matches)
-                        if matches[0].score >= config.search_threshold:
-                            col["propertyUrl"] = matches[0].payload["id"]
-                            # col["rdfs:label"] = matches[0].payload["label"]
-                            # To use a custom subject URL for this column use (code is the reference to a column title in the same file):
-                            # "aboutUrl": "http://example.org/country/{code}#geo",
-                        if config.comment_best_matches > 0:
-                            col["rdfs:comment"] = "Best matches: " + " - ".join(
-                                [
-                                    f"[{round(m.score, 2)}] {m.payload['label']} ({m.payload['type']}) <{m.payload['id']}>"
-                                    for m in matches
-                                ]
-                            )
-                            # NOTE: not valid to put notes on col
-                            # col["notes"] = [
-                            #     {
-                            #         "score": m.score,
-                            #         "id": m.payload["id"],
-                            #         "label": m.payload["label"],
-                            #         "category": m.payload["category"],
-                            #     }
-                            #     for m in matches
-                            # ]
-                            # "notes": [{
-                            #     "type": "Annotation",
-                            #     "target": "countries.csv#cell=2,6-*,7",
-                            #     "body": "These locations are of representative points.",
-                            #     "motivation": "commenting"
-                            # }]
-
-                    # Available CSVW datatypes: https://github.com/cldf/csvw/blob/master/tests/test_datatypes.py
-                    # Integer or float
-                    if var_report["type"] == "Numeric":
-                        base_type = (
-                            "integer" if next(iter(var_report["value_counts_index_sorted"])).isdigit() else "number"
-                        )
-                        col["datatype"] = {
-                            "base": base_type,
-                            "minimum": var_report["min"],
-                            "maximum": var_report["max"],
-                        }
-                        # col["constraints"] = {"minimum": var_report["min"], "maximum": var_report["max"]}
-                        # TODO: add mean? median?
-                        # Add format to details the 0 displayed? https://www.w3.org/TR/tabular-data-primer/#number-precision
-                        # TODO: Add unit information? https://www.w3.org/TR/tabular-data-primer/#uom-datatypes
-                        # "datatype": {
-                        #     "@id": "http://example.org/unit/kilometre",
-                        #     "@type": "http://example.org/quantity/length",
-                        #     "rdfs:label": "Kilometre",
-                        #     "base": "number",
-                        #     "skos:notation": "km"
-                        # }
-
-                    # Category
-                    elif var_report["type"] == "Categorical":
-                        # base_type = (
-                        #     "integer" if next(iter(var_report["value_counts_index_sorted"])).isdigit() else "string"
-                        # )
-                        col["datatype"] = {
-                            "base": "string",
-                            "format": "|".join(list(var_report["value_counts_index_sorted"].keys())),
-                        }
-
-                    # Boolean
-                    elif var_report["type"] == "Boolean":
-                        col["datatype"] = {"base": "boolean", "format": "|".join(df[var_name].unique())}
-                    else:
-                        col["datatype"] = "string"
-
-                    # col["null"] = "NA" // Indicates "NA" is used for missing values in this column
-
-                    table["tableSchema"]["columns"].append(col)
-
-                # NOTE: we could also add types to the tables: https://www.w3.org/TR/tabular-data-primer/#row-types
-                # Try to use the VectorDB to infer the table type based on all columns? Or use LLM
-                # table_type = "schema:Country"
-                # table["tableSchema"]["columns"].append({
-                #     "virtual": True,
-                #     "propertyUrl": "rdf:type",
-                #     "valueUrl": table_type
-                # })
-
-                # NOTE: possible to add transformations scripts: https://www.w3.org/TR/tabular-data-primer/#extension-transformations
-                # table["transformations"] = [{
-                #     "targetFormat": "http://www.iana.org/assignments/media-types/application/xml",
-                #     "titles": "Simple XML version",
-                #     "url": "xml-template.mustache",
-                #     "scriptFormat": "https://mustache.github.io/",
-                #     "source": "json"
-                # }]
-
-                self.csvw["tables"].append(table)
-        self.csvw["dc:created"] = {"@value": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"), "@type": "xsd:dateTime"}
+        self.csvw["tables"].extend(self.iter_tables(files, config))
+        self.csvw["dc:created"] = get_created_date()
+        if config.report_metrics:
+            self.csvw[METRICS_PROPERTY] = self.metrics.to_dict()
         return self.csvw
 
+    def write_files(
+        self,
+        files: List[str],
+        output: Union[str, TextIO],
+        json_lines: bool = False,
+        config: Optional[OntomapConfig] = None,
+    ) -> int:
+        """Profile a list of tabular files, and write each table to the output as soon as it is profiled
+
+        The tables are not kept in memory, the output is a CSVW JSON document, or a CSVW table per line with
+        `json_lines`. Returns the number of tables written
+        """
+        config = config if config else self.config
+        # The creation date and metrics are only known at the end, they are written after the tables
+        header = {"@context": self.csvw["@context"]}
+        with CsvwWriter(output, header, json_lines) as writer:
+            for table in self.iter_tables(files, config):
+                writer.write_table(table)
+            writer.properties["dc:created"] = get_created_date()
+            if config.report_metrics:
+                writer.properties[METRICS_PROPERTY] = self.metrics.to_dict()
+        return writer.tables_count
+
+    def iter_tables(self, files: List[str], config: Optional[OntomapConfig] = None) -> Iterator[Any]:
+        """Profile and map the files by batches, and yield their tables in the order of the files
+
+        Tables of files that did not change are taken from the profile cache, when enabled in the config
+        """
+        config = config if config else self.config
+        file_list = [file for glob_file in files for file in glob.glob(glob_file, recursive=True)]
+        cache = ProfileCache(config.profile_cache) if config.profile_cache else None
+        cache_key = self.get_cache_key(config)
+        executor = None
+        if config.workers > 1 and len(file_list) > 1:
+            # Profile files in a pool of processes, started once for all batches
+            executor = ProcessPoolExecutor(
+                max_workers=config.workers, initializer=init_worker, initargs=(sys.stdout is sys.stderr,)
+            )
+        try:
+            for batch in batched(file_list, PROFILE_BATCH_SIZE):
+                yield from self.profile_batch(batch, config, cache, cache_key, executor)
+        finally:
+            if executor:
+                executor.shutdown()
+        if cache is not None:
+            cache.prune()
+            if cache.hits:
+                print(f"⏩ Reused the cached profile of {cache.hits} unchanged files")
+
+    def profile_batch(
+        self,
+        files: List[str],
+        config: OntomapConfig,
+        cache: Optional[ProfileCache],
+        cache_key: str,
+        executor: Optional[ProcessPoolExecutor],
+    ) -> List[Any]:
+        """Profile a batch of files, and map the columns of all their tables at once"""
+        with self.metrics.stage("profile_files", files=len(files)):
+            # Reuse the tables of the files that did not change since they were cached
+            cached_tables: Dict[str, Any] = {}
+            if cache is not None:
+                with self.metrics.stage("profile_cache") as cache_counters:
+                    cached_tables = cache.get_many(files, cache_key)
+                    cache_counters.update({"hits": len(cached_tables), "misses": len(files) - len(cached_tables)})
+            new_files = [file for file in files if file not in cached_tables]
+
+            new_tables: List[Any] = []
+            if executor and len(new_files) > 1:
+                futures = [executor.submit(profile_table_with_metrics, file, config) for file in new_files]
+                try:
+                    # Tables are collected in the same order as the files
+                    for future in futures:
+                        table, stages = future.result()
+                        new_tables.append(table)
+                        self.metrics.merge(stages)
+                finally:
+                    # Do not profile the pending files when a file failed or the profiling was interrupted
+                    for future in futures:
+                        future.cancel()
+            else:
+                new_tables = [profile_table(file, config, self.metrics) for file in new_files]
+
+            if self.searcher:
+                # Map the columns of all tables in the parent process, to load the embedding model only once
+                self.map_columns([col for table in new_tables for col in table["tableSchema"]["columns"]], config)
+
+            profiled_tables = dict(zip(new_files, new_tables))
+            if cache is not None:
+                cache.put_many(profiled_tables, cache_key)
+            # Keep the tables in the same order as the files
+            all_tables = {**cached_tables, **profiled_tables}
+            return [all_tables[file] for file in files]
+
+    def get_cache_key(self, config: OntomapConfig) -> str:
+        """Get the key of the tables in the profile cache, from the config, ontologies manifests and package version"""
+        cache_config = {key: value for key, value in asdict(config).items() if key not in RUNTIME_CONFIG_FIELDS}
+        ontologies_hash = self.searcher.get_manifests_hash() if self.searcher else None
+        key_data = {"config": cache_config, "ontologies": ontologies_hash, "version": __version__}
+        return hashlib.sha256(json.dumps(key_data, sort_keys=True).encode()).hexdigest()
+
+    def map_columns(self, columns: List[Dict[str, Any]], config: OntomapConfig) -> None:
+        """Add the most matching property or class from the ontology to each column, searching all columns in batch"""
+        if not self.searcher:
+            return
+        with self.metrics.stage("map_columns", columns=len(columns)):
+            columns_matches = self.searcher.search(
+                [col["dc:title"] for col in columns],
+                config.comment_best_matches,
+                config.lexical_match,
+                config.lexical_weight,
+                config.term_types,
+            )
+        for col, matches in zip(columns, columns_matches):
+            add_column_matches(col, matches, config)
+
+
+def get_created_date() -> Dict[str, str]:
+    return {"@value": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"), "@type": "xsd:dateTime"}
+
+
+def add_column_matches(col: Dict[str, Any], matches: List["TermMatch"], config: OntomapConfig) -> None:
+    """Add the best match as propertyUrl of a column if its score is above the threshold, and the matches as comment"""
+    # Keep the datatype after the mappings in the column
+    datatype = col.pop("datatype")
+    if matches and matches[0].score >= config.search_threshold:
+        col["propertyUrl"] = matches[0].payload["id"]
+        # col["rdfs:label"] = matches[0].payload["label"]
+        # To use a custom subject URL for this column use (code is the reference to a column title in the same file):
+        # "aboutUrl": "http://example.org/country/{code}#geo",
+    if config.comment_best_matches > 0:
+        col["rdfs:comment"] = "Best matches: " + " - ".join(
+            [
+                f"[{round(m.score, 2)}] {m.payload['label']} ({m.payload['type']}) <{m.payload['id']}> via {m.source}"
+                for m in matches
+            ]
+        )
+        # NOTE: not valid to put notes on col
+        # col["notes"] = [
+        #     {
+        #         "score": m.score,
+        #         "id": m.payload["id"],
+        #         "label": m.payload["label"],
+        #         "category": m.payload["category"],
+        #     }
+        #     for m in matches
+        # ]
+        # "notes": [{
+        #     "type": "Annotation",
+        #     "target": "countries.csv#cell=2,6-*,7",
+        #     "body": "These locations are of representative points.",
+        #     "motivation": "commenting"
+        # }]
+    col["datatype"] = datatype
+
+
+def get_exact_bound(bound: Any, profiled_value: Any) -> Any:
+    """Convert the exact min or max of a column to a Python number, a float if it or the profiled value is a float"""
+    bound = bound.item() if hasattr(bound, "item") else bound
+    return float(bound) if isinstance(bound, float) or isinstance(profiled_value, float) else int(bound)
+
+
+def get_boolean_format(values: List[Any]) -> str:
+    """Get the CSVW format of a boolean column from its values: the token used for true, then the one for false
+
+    Tokens are kept as they are in the file (e.g. Y|N), values already parsed to booleans use true and false
+    """
+    tokens: Dict[bool, str] = {}
+    for value in values:
+        if pd.api.types.is_bool(value):
+            truth, token = bool(value), str(value).lower()
+        elif isinstance(value, str):
+            truth, token = BOOL_MAPPINGS.get(value.lower(), bool(value)), value
+        else:
+            truth, token = bool(value), str(value)
+        tokens.setdefault(truth, token)
+    return f"{tokens.get(True, 'true')}|{tokens.get(False, 'false')}"
+
+
+def init_worker(progress_to_stderr: bool) -> None:
+    """Print the progress of a profiling process to stderr, when the parent process writes the tables to stdout"""
+    if progress_to_stderr:
+        sys.stdout = sys.stderr
+
+
+def profile_table_with_metrics(file: str, config: OntomapConfig) -> Tuple[Any, Dict[str, Dict[str, Any]]]:
+    """Profile a tabular file in a worker process, and return the metrics of its stages with the table"""
+    metrics = Metrics()
+    return profile_table(file, config, metrics), metrics.stages
+
+
+def profile_table(file: str, config: OntomapConfig, metrics: Optional[Metrics] = None) -> Any:
+    """Profile a tabular file to generate its CSVW table, without ontology mappings
+
+    Defined at the module level to be run in a pool of processes
+    """
+    metrics = metrics if metrics is not None else Metrics()
+    print(f"🔍 Profiling {BOLD}{YELLOW}{file}{END}")
+    # Create new CSVW table for each file
+    table: Any = {"url": file, "tableSchema": {"columns": []}}
+
+    # Only the projected columns are loaded, and delimited files are read with their detected dialect
+    columns = config.columns if config.columns else None
+    dialect = get_dialect(file)
+    if dialect:
+        table["dialect"] = dialect
+    # Exact bounds of the numeric columns of Arrow files, computed by pyarrow instead of pandas when reading by chunks
+    arrow_bounds: Optional[Dict[str, Tuple[Any, Any]]] = {} if is_arrow_file(file) else None
+
+    variables: Dict[str, Dict[str, Any]]
+    boolean_values: Dict[str, List[Any]]
+    df: pd.DataFrame
+    if config.sample_rows > 0 or config.sample_fraction > 0:
+        # Profile a sample of the rows, taken in one pass over the file with the exact min/max and boolean values
+        with metrics.stage("read_and_sample") as counters:
+            df, bounds, rows_count = sample_chunks(
+                read_chunks(
+                    file,
+                    config.chunk_size if config.chunk_size > 0 else SAMPLE_CHUNK_SIZE,
+                    columns,
+                    dialect,
+                    arrow_bounds,
+                ),
+                config.sample_rows,
+                config.sample_fraction,
+                config.sample_seed,
+            )
+            counters.update({"rows": rows_count, "sampled_rows": len(df), "columns": len(df.columns)})
+        with metrics.stage(f"profile_{config.profiling_engine}", columns=len(df.columns)):
+            variables = profile_dataframe(df, config.profiling_engine)
+        boolean_values = {}
+        for var_name, var_report in variables.items():
+            var_bounds = bounds[var_name]
+            if var_report["type"] == "Numeric" and var_bounds.numeric and var_bounds.minimum is not None:
+                var_report["min"] = get_exact_bound(var_bounds.minimum, var_report["min"])
+                var_report["max"] = get_exact_bound(var_bounds.maximum, var_report["max"])
+            elif var_report["type"] == "Boolean":
+                unique_values = var_bounds.unique_values()
+                boolean_values[var_name] = (
+                    unique_values if unique_values is not None else df[var_name].dropna().unique().tolist()
+                )
+        table[SAMPLING_PROPERTY] = {
+            "method": "reservoir" if config.sample_rows > 0 else "bernoulli",
+            "sampleRows": config.sample_rows,
+            "sampleFraction": config.sample_fraction,
+            "seed": config.sample_seed,
+            "rowsCount": rows_count,
+            "sampledRowsCount": len(df),
+            # Properties inferred from the sample, the minimum, maximum and boolean formats are computed on all rows
+            "estimatedProperties": ["datatype.base", "datatype.format"],
+            "exactProperties": ["datatype.minimum", "datatype.maximum"],
+        }
+    elif config.chunk_size > 0 and not file.endswith((".xlsx", ".spss")):
+        # Stream the file by chunks, the memory used is bounded by the chunk size and not the file size
+        with metrics.stage("read_and_profile_chunks") as counters:
+            accumulators = profile_chunks(read_chunks(file, config.chunk_size, columns, dialect, arrow_bounds))
+            first_acc = next(iter(accumulators.values()), None)
+            counters["rows"] = first_acc.count + first_acc.n_missing if first_acc else 0
+            counters["columns"] = len(accumulators)
+        variables = {var_name: acc.report() for var_name, acc in accumulators.items()}
+        boolean_values = {var_name: acc.unique_values() for var_name, acc in accumulators.items()}
+    else:
+        # Read the whole file with pandas
+        with metrics.stage("read") as counters:
+            df = read_dataframe(file, columns, dialect)
+            counters["rows"], counters["columns"] = df.shape
+
+        # Run the profiling engine to get a report for each variable
+        with metrics.stage(f"profile_{config.profiling_engine}", columns=len(df.columns)):
+            variables = profile_dataframe(df, config.profiling_engine)
+        boolean_values = {
+            var_name: df[var_name].dropna().unique().tolist()
+            for var_name, var_report in variables.items()
+            if var_report["type"] == "Boolean"
+        }
+        if arrow_bounds is not None:
+            with metrics.stage("arrow_statistics"):
+                arrow_bounds = arrow_min_max(file, columns)
+
+    if arrow_bounds:
+        # Use the exact bounds computed by pyarrow, or stored in the Parquet footer, instead of the pandas ones
+        for var_name, (minimum, maximum) in arrow_bounds.items():
+            var_report = variables.get(var_name, {})
+            if var_report.get("type") == "Numeric":
+                var_report["min"] = get_exact_bound(minimum, var_report["min"])
+                var_report["max"] = get_exact_bound(maximum, var_report["max"])
+
+    # Create a CSVW column for each variable
+    for var_name, var_report in variables.items():
+        col: Dict[str, Any] = {"titles": var_name, "dc:title": separate_words(var_name)}
+
+        # Available CSVW datatypes: https://github.com/cldf/csvw/blob/master/tests/test_datatypes.py
+        # Integer or float
+        if var_report["type"] == "Numeric":
+            base_type = "integer" if next(iter(var_report["value_counts_index_sorted"])).isdigit() else "number"
+            if any(
+                isinstance(bound, float) and not bound.is_integer() for bound in (var_report["min"], var_report["max"])
+            ):
+                # The exact bounds computed on all rows can have decimals not found in the profiled rows
+                base_type = "number"
+            col["datatype"] = {
+                "base": base_type,
+                "minimum": var_report["min"],
+                "maximum": var_report["max"],
+            }
+            # col["constraints"] = {"minimum": var_report["min"], "maximum": var_report["max"]}
+            # TODO: add mean? median?
+            # Add format to details the 0 displayed? https://www.w3.org/TR/tabular-data-primer/#number-precision
+            # TODO: Add unit information? https://www.w3.org/TR/tabular-data-primer/#uom-datatypes
+            # "datatype": {
+            #     "@id": "http://example.org/unit/kilometre",
+            #     "@type": "http://example.org/quantity/length",
+            #     "rdfs:label": "Kilometre",
+            #     "base": "number",
+            #     "skos:notation": "km"
+            # }
+
+        # Category
+        elif var_report["type"] == "Categorical":
+            # base_type = (
+            #     "integer" if next(iter(var_report["value_counts_index_sorted"])).isdigit() else "string"
+            # )
+            col["datatype"] = {
+                "base": "string",
+                "format": "|".join(list(var_report["value_counts_index_sorted"].keys())),
+            }
+
+        # Boolean
+        elif var_report["type"] == "Boolean":
+            col["datatype"] = {
+                "base": "boolean",
+                "format": get_boolean_format(boolean_values[var_name]),
+            }
+        else:
+            col["datatype"] = "string"
+
+        # col["null"] = "NA" // Indicates "NA" is used for missing values in this column
+
+        table["tableSchema"]["columns"].append(col)
+
+    # NOTE: we could also add types to the tables: https://www.w3.org/TR/tabular-data-primer/#row-types
+    # Try to use the VectorDB to infer the table type based on all columns? Or use LLM
+    # table_type = "schema:Country"
+    # table["tableSchema"]["columns"].append({
+    #     "virtual": True,
+    #     "propertyUrl": "rdf:type",
+    #     "valueUrl": table_type
+    # })
 
-def separate_words(input_string: str) -> str:
-    """Separate words in column labels (e.g. RestingECG becomes Resting ECG)"""
-    # Replace underscores with spaces for snake_case
-    input_string = input_string.replace("_", " ")
-    # Insert spaces before capital letters for CamelCase
-    return re.sub(r"(?<=[a-z])(?=[A-Z])", " ", input_string)
+    # NOTE: possible to add transformations scripts: https://www.w3.org/TR/tabular-data-primer/#extension-transformations
+    # table["transformations"] = [{
+    #     "targetFormat": "http://www.iana.org/assignments/media-types/application/xml",
+    #     "titles": "Simple XML version",
+    #     "url": "xml-template.mustache",
+    #     "scriptFormat": "https://mustache.github.io/",
+    #     "source": "json"
+    # }]
+    return table
 
 
 CSVW_BASE = {
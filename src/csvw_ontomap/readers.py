@@ -0,0 +1,205 @@
+"""Read tabular files in memory or by chunks: delimited text files, Excel, SPSS, Parquet and Arrow IPC/Feather.
+
+Parquet and Arrow files are memory-mapped and only the projected columns are read, pyarrow is imported when used.
+"""
+import csv
+import importlib
+from typing import Any, Collection, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+PARQUET_EXTENSIONS = (".parquet", ".pq")
+ARROW_EXTENSIONS = (".feather", ".arrow", ".ipc")
+# Number of bytes read at the start of delimited files to detect their dialect
+SNIFF_SIZE = 64 * 1024
+SNIFF_DELIMITERS = ",;\t|"
+DEFAULT_DIALECT = {"delimiter": ",", "quoteChar": '"'}
+
+
+def is_arrow_file(file: str) -> bool:
+    return file.endswith(PARQUET_EXTENSIONS + ARROW_EXTENSIONS)
+
+
+def is_delimited_file(file: str) -> bool:
+    return not is_arrow_file(file) and not file.endswith((".xlsx", ".spss"))
+
+
+def get_dialect(file: str) -> Dict[str, Any]:
+    """Detect the CSVW dialect of a delimited file, empty if it is not delimited or uses the default dialect"""
+    if not is_delimited_file(file):
+        return {}
+    if file.endswith(".tsv"):
+        return {"delimiter": "\t"}
+    with open(file, newline="", encoding="utf-8", errors="replace") as f:
+        sample = f.read(SNIFF_SIZE)
+    try:
+        sniffed = csv.Sniffer().sniff(sample, delimiters=SNIFF_DELIMITERS)
+    except csv.Error:
+        return {}
+    dialect = {"delimiter": sniffed.delimiter, "quoteChar": sniffed.quotechar}
+    return {key: value for key, value in dialect.items() if value != DEFAULT_DIALECT[key]}
+
+
+def csv_options(dialect: Dict[str, Any], columns: Optional[List[str]]) -> Dict[str, Any]:
+    """Options of `pd.read_csv` for a CSVW dialect and a projection of columns"""
+    options: Dict[str, Any] = {
+        "true_values": ["true"],
+        "false_values": ["false"],
+        "sep": dialect.get("delimiter", DEFAULT_DIALECT["delimiter"]),
+        "quotechar": dialect.get("quoteChar", DEFAULT_DIALECT["quoteChar"]),
+    }
+    if columns:
+        options["usecols"] = lambda col: col in columns
+    return options
+
+
+def read_dataframe(
+    file: str, columns: Optional[List[str]] = None, dialect: Optional[Dict[str, Any]] = None
+) -> pd.DataFrame:
+    """Read a whole tabular file, only the given columns (if any) are loaded"""
+    usecols = (lambda col: col in columns) if columns else None
+    df: pd.DataFrame
+    if file.endswith(".xlsx"):
+        df = pd.read_excel(file, usecols=usecols)
+    elif file.endswith(".spss"):
+        df = pd.read_spss(file, usecols=columns if columns else None)
+    elif is_arrow_file(file):
+        df = read_arrow_table(file, columns).to_pandas()
+    else:
+        df = pd.read_csv(file, **csv_options(dialect or {}, columns))
+    return df
+
+
+def read_chunks(
+    file: str,
+    chunk_size: int,
+    columns: Optional[List[str]] = None,
+    dialect: Optional[Dict[str, Any]] = None,
+    bounds: Optional[Dict[str, Tuple[Any, Any]]] = None,
+) -> Iterable[pd.DataFrame]:
+    """Read a tabular file by chunks of rows, Excel and SPSS files are read in one chunk
+
+    For Arrow files, the exact min and max of the numeric columns are added to `bounds` (if given) as they are read
+    """
+    if file.endswith((".xlsx", ".spss")):
+        return [read_dataframe(file, columns)]
+    if is_arrow_file(file):
+        return iter_arrow_chunks(file, chunk_size, columns, bounds)
+    chunks: Iterable[pd.DataFrame] = pd.read_csv(file, chunksize=chunk_size, **csv_options(dialect or {}, columns))
+    return chunks
+
+
+def read_arrow_table(file: str, columns: Optional[List[str]] = None) -> Any:
+    """Read the projected columns of a Parquet or Arrow IPC/Feather file as a memory-mapped Arrow table"""
+    if file.endswith(PARQUET_EXTENSIONS):
+        pq = import_pyarrow("parquet")
+        return pq.read_table(file, columns=project_columns(pq.read_schema(file).names, columns), memory_map=True)
+    feather = import_pyarrow("feather")
+    return feather.read_table(file, columns=project_columns(read_arrow_schema(file).names, columns), memory_map=True)
+
+
+def read_arrow_schema(file: str) -> Any:
+    """Read the schema of a Parquet or Arrow IPC/Feather file, without reading its data"""
+    if file.endswith(PARQUET_EXTENSIONS):
+        return import_pyarrow("parquet").read_schema(file, memory_map=True)
+    pa = import_pyarrow()
+    with pa.memory_map(file) as source:
+        return import_pyarrow("ipc").open_file(source).schema
+
+
+def iter_arrow_chunks(
+    file: str,
+    chunk_size: int,
+    columns: Optional[List[str]] = None,
+    bounds: Optional[Dict[str, Tuple[Any, Any]]] = None,
+) -> Iterator[pd.DataFrame]:
+    """Read a Parquet file by batches of rows, or a memory-mapped Arrow file by slices, converted to DataFrames
+
+    If `bounds` is given, the min and max of the numeric columns are added to it: from the Parquet footer statistics
+    when available, otherwise computed with pyarrow on each batch before converting it
+    """
+    if bounds is not None and file.endswith(PARQUET_EXTENSIONS):
+        bounds.update(parquet_footer_min_max(file, columns))
+    footer_columns = set(bounds) if bounds else set()
+    if file.endswith(PARQUET_EXTENSIONS):
+        pq = import_pyarrow("parquet")
+        parquet_file = pq.ParquetFile(file, memory_map=True)
+        projection = project_columns(parquet_file.schema_arrow.names, columns)
+        batches = parquet_file.iter_batches(batch_size=chunk_size, columns=projection)
+    else:
+        batches = read_arrow_table(file, columns).to_batches(max_chunksize=chunk_size)
+    for batch in batches:
+        if bounds is not None:
+            update_min_max(bounds, batch, footer_columns)
+        yield batch.to_pandas()
+
+
+def arrow_min_max(file: str, columns: Optional[List[str]] = None) -> Dict[str, Tuple[Any, Any]]:
+    """Get the min and max of the numeric columns of an Arrow file, without converting it to pandas
+
+    For Parquet files they are read from the statistics in the footer when all row groups have them,
+    only the other numeric columns are read, and computed with pyarrow on the memory-mapped table
+    """
+    bounds: Dict[str, Tuple[Any, Any]] = {}
+    if file.endswith(PARQUET_EXTENSIONS):
+        bounds = parquet_footer_min_max(file, columns)
+    missing = [
+        field.name
+        for field in read_arrow_schema(file)
+        if (not columns or field.name in columns) and is_numeric_type(field.type) and field.name not in bounds
+    ]
+    if missing:
+        update_min_max(bounds, read_arrow_table(file, missing))
+    return bounds
+
+
+def update_min_max(bounds: Dict[str, Tuple[Any, Any]], data: Any, skip: Collection[str] = ()) -> None:
+    """Extend the min and max of the numeric columns with the values of an Arrow table or record batch"""
+    pc = import_pyarrow("compute")
+    for name, column in zip(data.schema.names, data.columns):
+        if name in skip or not is_numeric_type(column.type) or column.null_count == len(column):
+            continue
+        min_max = pc.min_max(column)
+        minimum, maximum = min_max["min"].as_py(), min_max["max"].as_py()
+        if name in bounds:
+            minimum, maximum = min(bounds[name][0], minimum), max(bounds[name][1], maximum)
+        bounds[name] = (minimum, maximum)
+
+
+def is_numeric_type(data_type: Any) -> bool:
+    pa = import_pyarrow()
+    return bool(pa.types.is_integer(data_type) or pa.types.is_floating(data_type))
+
+
+def parquet_footer_min_max(file: str, columns: Optional[List[str]] = None) -> Dict[str, Tuple[Any, Any]]:
+    """Get the min and max of the numeric columns of a Parquet file from the statistics of its row groups"""
+    pq = import_pyarrow("parquet")
+    metadata = pq.ParquetFile(file, memory_map=True).metadata
+    schema = metadata.schema.to_arrow_schema()
+    bounds: Dict[str, Tuple[Any, Any]] = {}
+    if metadata.num_columns != len(schema):
+        # Nested columns are stored as several leaf columns
+        return bounds
+    for i, name in enumerate(metadata.schema.names):
+        if (columns and name not in columns) or not is_numeric_type(schema.field(name).type):
+            continue
+        stats = [metadata.row_group(rg).column(i).statistics for rg in range(metadata.num_row_groups)]
+        if not stats or any(stat is None or not stat.has_min_max for stat in stats):
+            continue
+        bounds[name] = (min(stat.min for stat in stats), max(stat.max for stat in stats))
+    return bounds
+
+
+def project_columns(names: List[str], columns: Optional[List[str]]) -> List[str]:
+    """Keep the columns of a file that are in the projection, in the order of the file"""
+    return [name for name in names if not columns or name in columns]
+
+
+def import_pyarrow(module: str = "") -> Any:
+    """Import pyarrow, or one of its modules, which is only required to read Parquet and Arrow files"""
+    try:
+        return importlib.import_module(f"pyarrow.{module}" if module else "pyarrow")
+    except ImportError as e:
+        raise ImportError(
+            "pyarrow is required to read Parquet and Arrow files, install it with `pip install csvw-ontomap[arrow]`"
+        ) from e
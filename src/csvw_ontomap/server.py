@@ -0,0 +1,335 @@
+"""HTTP server keeping the embedding model and the VectorDB loaded to profile and map files as they arrive."""
+import json
+import queue
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple, get_type_hints
+
+from csvw_ontomap.lexical import TermMatch
+from csvw_ontomap.ontology import SEARCH_BATCH_SIZE, OntologySearcher
+from csvw_ontomap.profiler import CsvwProfiler, add_column_matches
+from csvw_ontomap.utils import BOLD, CYAN, END, OntomapConfig, log
+
+# Maximum time to wait for other search requests to batch with, in seconds
+DEFAULT_BATCH_WAIT = 0.01
+# Number of finished profiling jobs kept to be retrieved
+MAX_FINISHED_JOBS = 1000
+# Config fields a profiling job can override, the others are set when starting the server
+JOB_CONFIG_FIELDS = [
+    "comment_best_matches",
+    "search_threshold",
+    "profiling_engine",
+    "chunk_size",
+    "lexical_match",
+    "lexical_weight",
+    "term_types",
+    "report_metrics",
+    "sample_rows",
+    "sample_fraction",
+    "sample_seed",
+    "columns",
+]
+
+
+@dataclass
+class SearchRequest:
+    queries: List[str]
+    params: Tuple[int, bool, float, Tuple[str, ...]]
+    """Limit, lexical match, lexical weight and term types of the search"""
+    future: "Future[List[List[TermMatch]]]" = field(default_factory=Future)
+
+
+class SearchBatcher:
+    """Gather the search queries of concurrent requests, to embed and search them in shared batches
+
+    A single thread runs the searches, so the searcher is never used concurrently
+    """
+
+    def __init__(
+        self, searcher: OntologySearcher, batch_wait: float = DEFAULT_BATCH_WAIT, max_batch: int = SEARCH_BATCH_SIZE
+    ) -> None:
+        self.searcher = searcher
+        self.batch_wait = batch_wait
+        self.max_batch = max_batch
+        self.requests: queue.Queue[SearchRequest] = queue.Queue()
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def search(
+        self,
+        queries: List[str],
+        limit: int = 3,
+        lexical_match: bool = True,
+        lexical_weight: float = 0.3,
+        term_types: Optional[List[str]] = None,
+    ) -> List[List[TermMatch]]:
+        """Search matching entities for a list of queries, waiting for the batch including them to be searched"""
+        request = SearchRequest(queries, (limit, lexical_match, lexical_weight, tuple(term_types or [])))
+        self.requests.put(request)
+        return request.future.result()
+
+    def run(self) -> None:
+        while True:
+            batch = [self.requests.get()]
+            deadline = time.monotonic() + self.batch_wait
+            while sum(len(request.queries) for request in batch) < self.max_batch:
+                try:
+                    batch.append(self.requests.get(timeout=max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    break
+            self.search_batch(batch)
+
+    def search_batch(self, batch: List[SearchRequest]) -> None:
+        """Search the queries of all requests with the same parameters at once, and resolve each request"""
+        groups: Dict[Tuple[int, bool, float, Tuple[str, ...]], List[SearchRequest]] = {}
+        for request in batch:
+            groups.setdefault(request.params, []).append(request)
+        for params, requests in groups.items():
+            limit, lexical_match, lexical_weight, term_types = params
+            try:
+                with self.searcher.metrics.stage("search_batch", requests=len(requests)):
+                    results = self.searcher.search(
+                        [query for request in requests for query in request.queries],
+                        limit,
+                        lexical_match,
+                        lexical_weight,
+                        list(term_types),
+                    )
+            except Exception as e:
+                for request in requests:
+                    request.future.set_exception(e)
+                continue
+            offset = 0
+            for request in requests:
+                request.future.set_result(results[offset : offset + len(request.queries)])
+                offset += len(request.queries)
+
+
+class OntomapServer(ThreadingHTTPServer):
+    """Profile files in the background, and map their columns with a searcher loaded once"""
+
+    def __init__(
+        self,
+        address: Tuple[str, int],
+        searcher: Optional[OntologySearcher] = None,
+        config: Optional[OntomapConfig] = None,
+        jobs: int = 2,
+        batch_wait: float = DEFAULT_BATCH_WAIT,
+    ) -> None:
+        super().__init__(address, OntomapRequestHandler)
+        self.config = config if config else OntomapConfig()
+        self.searcher = searcher
+        self.batcher = SearchBatcher(searcher, batch_wait) if searcher else None
+        self.executor = ThreadPoolExecutor(max_workers=jobs)
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self.jobs_lock = threading.Lock()
+
+    def submit_profiling(self, files: List[str], config: OntomapConfig) -> Dict[str, Any]:
+        """Start a profiling job in the background, returns the job without its result"""
+        job: Dict[str, Any] = {"id": str(uuid.uuid4()), "status": "pending", "files": files}
+        with self.jobs_lock:
+            self.jobs[job["id"]] = job
+            finished = [job_id for job_id, other in self.jobs.items() if other["status"] in ("done", "failed")]
+            for job_id in finished[: max(len(finished) - MAX_FINISHED_JOBS, 0)]:
+                del self.jobs[job_id]
+        self.executor.submit(self.run_profiling, job, files, config)
+        return dict(job)
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self.jobs_lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def update_job(self, job: Dict[str, Any], **fields: Any) -> None:
+        with self.jobs_lock:
+            job.update(fields)
+
+    def run_profiling(self, job: Dict[str, Any], files: List[str], config: OntomapConfig) -> None:
+        self.update_job(job, status="running")
+        try:
+            profiler = CsvwProfiler(config=config)
+            csvw = profiler.profile_files(files, config)
+            if self.batcher:
+                columns = [col for table in csvw["tables"] for col in table["tableSchema"]["columns"]]
+                columns_matches = self.batcher.search(
+                    [col["dc:title"] for col in columns],
+                    config.comment_best_matches,
+                    config.lexical_match,
+                    config.lexical_weight,
+                    config.term_types,
+                )
+                for col, matches in zip(columns, columns_matches):
+                    add_column_matches(col, matches, config)
+            self.update_job(job, status="done", result=csvw)
+        except Exception as e:
+            log.error(f"Profiling job {job['id']} failed: {e}")
+            self.update_job(job, status="failed", error=str(e))
+
+    def server_close(self) -> None:
+        # Pending jobs can only be cancelled at shutdown since Python 3.9
+        if sys.version_info >= (3, 9):
+            self.executor.shutdown(wait=False, cancel_futures=True)
+        else:
+            self.executor.shutdown(wait=False)
+        super().server_close()
+
+
+class OntomapRequestHandler(BaseHTTPRequestHandler):
+    """Routes of the HTTP API:
+
+    - GET /health
+    - POST /profile {"files": [...], "config": {...}}: start a profiling job, returns its ID
+    - GET /jobs/{id}: get the status of a profiling job, and its CSVW metadata when done
+    - POST /search {"queries": [...], "limit": 3, "term_types": ["property"]}: search the ontology terms matching
+      column titles, optionally only of some types
+    - GET /metrics: time and memory used by the searches
+    """
+
+    server: OntomapServer
+
+    def do_GET(self) -> None:
+        if self.path == "/health":
+            self.send_json({"status": "ok", "ontologies": bool(self.server.searcher)})
+        elif self.path.startswith("/jobs/"):
+            job = self.server.get_job(self.path[len("/jobs/") :])
+            if job:
+                self.send_json(job)
+            else:
+                self.send_json({"error": "Job not found"}, 404)
+        elif self.path == "/metrics":
+            self.send_json(self.server.searcher.metrics.to_dict() if self.server.searcher else {})
+        else:
+            self.send_json({"error": "Not found"}, 404)
+
+    def do_POST(self) -> None:
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or "{}")
+        except ValueError:
+            self.send_json({"error": "Invalid JSON body"}, 400)
+            return
+        if not isinstance(body, dict):
+            self.send_json({"error": "The body must be a JSON object"}, 400)
+            return
+        if self.path == "/profile":
+            try:
+                check_type("files", body.get("files"), List[str])
+                if not body["files"]:
+                    raise ValueError("Provide the files to profile")
+                config = get_job_config(self.server.config, body.get("config", {}))
+            except ValueError as e:
+                self.send_json({"error": str(e)}, 400)
+                return
+            self.send_json(self.server.submit_profiling(body["files"], config), 202)
+        elif self.path == "/search":
+            if not self.server.batcher:
+                self.send_json({"error": "No ontology loaded, start the server with -m"}, 400)
+                return
+            config = self.server.config
+            defaults = {
+                "queries": [],
+                "limit": 3,
+                "lexical_match": config.lexical_match,
+                "lexical_weight": config.lexical_weight,
+                "term_types": config.term_types,
+            }
+            params = {name: body.get(name, default) for name, default in defaults.items()}
+            try:
+                for name, value in params.items():
+                    check_type(name, value, SEARCH_PARAMS_TYPES[name])
+            except ValueError as e:
+                self.send_json({"error": str(e)}, 400)
+                return
+            columns_matches = self.server.batcher.search(**params)
+            self.send_json(
+                {
+                    "results": [
+                        [{**match.payload, "score": match.score, "source": match.source} for match in matches]
+                        for matches in columns_matches
+                    ]
+                }
+            )
+        else:
+            self.send_json({"error": "Not found"}, 404)
+
+    def send_json(self, data: Any, status: int = 200) -> None:
+        content = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+        log.debug(format % args)
+
+
+SEARCH_PARAMS_TYPES: Dict[str, Any] = {
+    "queries": List[str],
+    "limit": int,
+    "lexical_match": bool,
+    "lexical_weight": float,
+    "term_types": List[str],
+}
+
+
+def get_job_config(config: OntomapConfig, overrides: Any) -> OntomapConfig:
+    """Get the config of a profiling job, from the server config and the fields overridden in the request"""
+    if not isinstance(overrides, dict):
+        raise ValueError("Invalid config: must be a JSON object")
+    config_types = get_type_hints(OntomapConfig)
+    for name, value in overrides.items():
+        if name not in JOB_CONFIG_FIELDS:
+            raise ValueError(f"Invalid config: {name} can not be set for a job, only {', '.join(JOB_CONFIG_FIELDS)}")
+        check_type(f"config.{name}", value, config_types[name])
+    return OntomapConfig(**{**asdict(config), **overrides})
+
+
+def check_type(name: str, value: Any, expected: Any) -> None:
+    """Raise a ValueError if a value of a request body is not of the expected type: bool, int, float, str or List[str]"""
+    if expected == List[str]:
+        valid = isinstance(value, list) and all(isinstance(item, str) for item in value)
+    elif expected is float:
+        valid = isinstance(value, (int, float)) and not isinstance(value, bool)
+    elif expected is int:
+        valid = isinstance(value, int) and not isinstance(value, bool)
+    else:
+        valid = isinstance(value, expected)
+    if not valid:
+        type_name = "list of strings" if expected == List[str] else expected.__name__
+        raise ValueError(f"Invalid {name}: must be a {type_name}")
+
+
+def serve(
+    host: str = "127.0.0.1",
+    port: int = 8000,
+    ontologies: Optional[List[str]] = None,
+    vectordb_path: str = "data/vectordb",
+    config: Optional[OntomapConfig] = None,
+    refresh: bool = False,
+    jobs: int = 2,
+) -> None:
+    """Load the ontologies once, and serve the profiling and search API until interrupted"""
+    config = config if config else OntomapConfig()
+    searcher = None
+    if ontologies:
+        searcher = OntologySearcher(
+            vectordb_path,
+            cache_size=config.embedding_cache_size,
+            model_name=config.embedding_model,
+            quantization=config.quantization,
+            on_disk=config.vectors_on_disk,
+            vectordb_url=config.vectordb_url,
+        )
+        searcher.load(ontologies, False, refresh, config.label_predicates, config.ingest_workers)
+    server = OntomapServer((host, port), searcher, config, jobs)
+    print(f"🚀 Serving the csvw-ontomap API on {BOLD}{CYAN}http://{host}:{port}{END}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,338 @@
+"""Profile tabular files in streaming, by chunks, with mergeable per-column accumulators.
+
+The memory used is bounded by the size of the chunks and the capacity of the value counters,
+and the reports generated have the same format as the reports of the in-memory profiling engines.
+"""
+import math
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas.api import types as pdt
+
+from csvw_ontomap.engines import (
+    BOOL_MAPPINGS,
+    CAT_CARDINALITY_THRESHOLD,
+    CAT_PERCENTAGE_THRESHOLD,
+    NUM_LOW_CATEGORICAL_THRESHOLD,
+    json_key,
+)
+
+DEFAULT_COUNTER_CAPACITY = 1000
+# Maximum number of distinct values kept to get the values of boolean columns on all rows
+BOOLEAN_VALUES_CAPACITY = 10
+
+
+class HyperLogLog:
+    """Approximate distinct count of values, with registers that can be merged"""
+
+    def __init__(self, precision: int = 12) -> None:
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def update(self, values: pd.Series) -> None:
+        hashes = pd.util.hash_pandas_object(values, index=False).to_numpy(dtype=np.uint64)
+        if hashes.size == 0:
+            return
+        rest_bits = 64 - self.precision
+        indexes = (hashes >> np.uint64(rest_bits)).astype(np.int64)
+        rest = hashes & np.uint64((1 << rest_bits) - 1)
+        # Position of the leftmost 1 bit in the remaining bits
+        with np.errstate(divide="ignore"):
+            bit_length = np.where(rest > 0, np.floor(np.log2(rest.astype(np.float64))) + 1, 0)
+        ranks = (rest_bits - bit_length + 1).astype(np.uint8)
+        np.maximum.at(self.registers, indexes, ranks)
+
+    def merge(self, other: "HyperLogLog") -> None:
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def count(self) -> int:
+        m = self.registers.size
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / float(np.sum(np.power(2.0, -self.registers.astype(np.float64))))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros > 0:
+            # Small range correction
+            estimate = m * math.log(m / zeros)
+        return round(estimate)
+
+
+class ValueCounter:
+    """Count values exactly up to a capacity, then only keep the heavy hitters (Misra-Gries summary)"""
+
+    def __init__(self, capacity: int = DEFAULT_COUNTER_CAPACITY) -> None:
+        self.capacity = capacity
+        self.counts: Dict[Any, int] = {}
+        self.exact = True
+
+    def update(self, values: pd.Series) -> None:
+        chunk_counts = values.value_counts(sort=False)
+        # Add new values in order of appearance
+        for value in values.unique().tolist():
+            self.counts[value] = self.counts.get(value, 0) + int(chunk_counts[value])
+        self.reduce()
+
+    def merge(self, other: "ValueCounter") -> None:
+        for value, count in other.counts.items():
+            self.counts[value] = self.counts.get(value, 0) + count
+        self.exact = self.exact and other.exact
+        self.reduce()
+
+    def reduce(self) -> None:
+        """Only keep the values more frequent than the value at the position capacity + 1"""
+        if len(self.counts) <= self.capacity:
+            return
+        self.exact = False
+        threshold = sorted(self.counts.values(), reverse=True)[self.capacity]
+        self.counts = {value: count - threshold for value, count in self.counts.items() if count > threshold}
+
+
+class ColumnAccumulator:
+    """Accumulate the statistics of a column chunk by chunk: kinds of values, nulls, min/max, distinct and values counts"""
+
+    def __init__(self, counter_capacity: int = DEFAULT_COUNTER_CAPACITY) -> None:
+        self.kinds: Set[str] = set()
+        self.count = 0
+        self.n_missing = 0
+        self.minimum: Any = None
+        self.maximum: Any = None
+        self.min_count = 0
+        self.numeric_strings = True
+        self.values = ValueCounter(counter_capacity)
+        self.distinct = HyperLogLog()
+
+    def update(self, series: pd.Series) -> None:
+        values = series.dropna()
+        self.n_missing += int(series.size - values.size)
+        if values.empty:
+            return
+        self.count += int(values.size)
+        kind = value_kind(values)
+        self.kinds.add(kind)
+        if kind in ("int", "float"):
+            self.update_min_max(values)
+        elif kind == "string" and self.numeric_strings:
+            try:
+                self.update_min_max(pd.to_numeric(values))
+            except (TypeError, ValueError):
+                self.numeric_strings = False
+        self.values.update(values)
+        self.distinct.update(values)
+
+    def update_min_max(self, values: pd.Series) -> None:
+        chunk_min = values.min().item()
+        chunk_max = values.max().item()
+        chunk_min_count = int((values == chunk_min).sum())
+        self.merge_min_max(chunk_min, chunk_max, chunk_min_count)
+
+    def merge_min_max(self, minimum: Any, maximum: Any, min_count: int) -> None:
+        if self.minimum is None or minimum < self.minimum:
+            self.minimum = minimum
+            self.min_count = min_count
+        elif minimum == self.minimum:
+            self.min_count += min_count
+        if self.maximum is None or maximum > self.maximum:
+            self.maximum = maximum
+
+    def merge(self, other: "ColumnAccumulator") -> None:
+        self.kinds |= other.kinds
+        self.count += other.count
+        self.n_missing += other.n_missing
+        if other.minimum is not None:
+            self.merge_min_max(other.minimum, other.maximum, other.min_count)
+        self.numeric_strings = self.numeric_strings and other.numeric_strings
+        self.values.merge(other.values)
+        self.distinct.merge(other.distinct)
+
+    @property
+    def n_distinct(self) -> int:
+        return len(self.values.counts) if self.values.exact else self.distinct.count()
+
+    def unique_values(self) -> List[Any]:
+        """Values in order of appearance (all values if the counter did not reach its capacity)"""
+        return list(self.values.counts.keys())
+
+    def report(self) -> Dict[str, Any]:
+        """Generate a variable report in the same format as the profiling engines"""
+        if self.count == 0:
+            return {"type": "Unsupported"}
+        report: Dict[str, Any] = {"type": "Unsupported", "n_distinct": self.n_distinct, "n_missing": self.n_missing}
+        counts = self.values.counts
+        if self.kinds == {"bool"}:
+            report.update(boolean_report(counts))
+        elif self.kinds <= {"int", "float"}:
+            # Integers columns with missing values are loaded as floats by pandas
+            is_float = "float" in self.kinds or self.n_missing > 0
+            cast = float if is_float else int
+            typed_counts = convert_counts(counts, cast)
+            if self.values.exact and len(typed_counts) <= NUM_LOW_CATEGORICAL_THRESHOLD:
+                report.update(categorical_report(typed_counts))
+            else:
+                typed_counts[cast(self.minimum)] = self.min_count
+                report.update(
+                    {
+                        "type": "Numeric",
+                        "min": cast(self.minimum),
+                        "max": cast(self.maximum),
+                        "value_counts_index_sorted": sorted_counts(typed_counts),
+                    }
+                )
+        elif "string" in self.kinds and self.kinds <= {"int", "float", "string"}:
+            str_counts = convert_counts(counts, str)
+            n_unique = self.n_distinct
+            if self.values.exact and all(value.lower() in BOOL_MAPPINGS for value in str_counts):
+                report.update(boolean_report(convert_counts(str_counts, lambda value: BOOL_MAPPINGS[value.lower()])))
+            elif self.numeric_strings:
+                if self.values.exact and n_unique <= NUM_LOW_CATEGORICAL_THRESHOLD:
+                    report.update(categorical_report(str_counts))
+                else:
+                    numeric_counts = convert_counts(str_counts, lambda value: pd.to_numeric(value).item())
+                    numeric_counts[self.minimum] = self.min_count
+                    report.update(
+                        {
+                            "type": "Numeric",
+                            "min": self.minimum,
+                            "max": self.maximum,
+                            "value_counts_index_sorted": sorted_counts(numeric_counts),
+                        }
+                    )
+            elif (
+                self.values.exact
+                and n_unique <= CAT_CARDINALITY_THRESHOLD
+                and n_unique / self.count < CAT_PERCENTAGE_THRESHOLD
+            ):
+                report.update(categorical_report(str_counts))
+            else:
+                report["type"] = "Text"
+        return report
+
+
+def value_kind(values: pd.Series) -> str:
+    """Get the kind of values in a chunk of a column without nulls: bool, int, float, string or other"""
+    if pdt.is_bool_dtype(values) or (pdt.is_object_dtype(values) and values.isin({True, False}).all()):
+        return "bool"
+    if pdt.is_integer_dtype(values):
+        return "int"
+    if pdt.is_float_dtype(values):
+        return "float"
+    if pdt.is_string_dtype(values) and all(isinstance(v, str) for v in values.values[0:5]):
+        return "string"
+    return "other"
+
+
+def convert_counts(counts: Dict[Any, int], convert: Callable[[Any], Any]) -> Dict[Any, int]:
+    """Convert the values of a counter, summing the counts of values that become equal"""
+    converted: Dict[Any, int] = {}
+    for value, count in counts.items():
+        key = convert(value)
+        converted[key] = converted.get(key, 0) + count
+    return converted
+
+
+def sorted_counts(counts: Dict[Any, int]) -> Dict[str, int]:
+    """Sort values counts by value, with keys serialized as in the ydata JSON report"""
+    return {json_key(value): count for value, count in sorted(counts.items(), key=lambda item: item[0])}
+
+
+def categorical_report(counts: Dict[Any, int]) -> Dict[str, Any]:
+    """Report for categorical variables, values are compared as strings"""
+    return {"type": "Categorical", "value_counts_index_sorted": sorted_counts(convert_counts(counts, str))}
+
+
+def boolean_report(counts: Dict[Any, int]) -> Dict[str, Any]:
+    """Report for boolean variables, values are serialized as JSON booleans"""
+    return {"type": "Boolean", "value_counts_index_sorted": sorted_counts(convert_counts(counts, bool))}
+
+
+def profile_chunks(
+    chunks: Iterable[pd.DataFrame], counter_capacity: int = DEFAULT_COUNTER_CAPACITY
+) -> Dict[str, ColumnAccumulator]:
+    """Accumulate the statistics of each column over an iterable of DataFrame chunks"""
+    accumulators: Dict[str, ColumnAccumulator] = {}
+    for chunk in chunks:
+        for var_name in chunk.columns:
+            accumulator = accumulators.setdefault(str(var_name), ColumnAccumulator(counter_capacity))
+            accumulator.update(chunk[var_name])
+    return accumulators
+
+
+class RowSampler:
+    """Sample rows of a table chunk by chunk, in one pass
+
+    Keeps a uniform reservoir sample of `sample_rows` rows, or each row with a probability of `sample_fraction`
+    """
+
+    def __init__(self, sample_rows: int = 0, sample_fraction: float = 0, seed: int = 42) -> None:
+        self.sample_rows = sample_rows
+        self.sample_fraction = sample_fraction
+        self.rng = np.random.default_rng(seed)
+        self.rows_count = 0
+        self.sample: Optional[pd.DataFrame] = None
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        chunk = chunk.reset_index(drop=True)
+        positions = np.arange(self.rows_count, self.rows_count + len(chunk))
+        self.rows_count += len(chunk)
+        if self.sample_rows <= 0:
+            self.add_rows(chunk[self.rng.random(len(chunk)) < self.sample_fraction])
+            return
+        # Algorithm R: the first rows fill the reservoir, then the row at position i replaces a random slot with a
+        # probability of sample_rows / (i + 1)
+        slots = self.rng.integers(0, positions + 1)
+        slots[positions < self.sample_rows] = positions[positions < self.sample_rows]
+        selected = slots < self.sample_rows
+        # When several rows of the chunk replace the same slot, the last one is kept
+        selected[selected] = ~pd.Series(slots[selected]).duplicated(keep="last").to_numpy()
+        self.add_rows(chunk[selected].set_axis(slots[selected]))
+
+    def add_rows(self, rows: pd.DataFrame) -> None:
+        if self.sample is None:
+            self.sample = rows
+        elif self.sample_rows > 0:
+            self.sample = pd.concat([self.sample[~self.sample.index.isin(rows.index)], rows])
+        else:
+            self.sample = pd.concat([self.sample, rows], ignore_index=True)
+
+
+class ColumnBounds:
+    """Track the exact min and max of a numeric column, and the distinct values of a column with few values"""
+
+    def __init__(self) -> None:
+        self.numeric = True
+        self.minimum: Any = None
+        self.maximum: Any = None
+        self.values: Dict[Any, None] = {}
+
+    def update(self, series: pd.Series) -> None:
+        values = series.dropna()
+        if values.empty:
+            return
+        if pdt.is_numeric_dtype(values) and not pdt.is_bool_dtype(values):
+            chunk_min, chunk_max = values.min().item(), values.max().item()
+            self.minimum = chunk_min if self.minimum is None else min(self.minimum, chunk_min)
+            self.maximum = chunk_max if self.maximum is None else max(self.maximum, chunk_max)
+        else:
+            self.numeric = False
+        if len(self.values) <= BOOLEAN_VALUES_CAPACITY:
+            self.values.update(dict.fromkeys(values.unique()[: BOOLEAN_VALUES_CAPACITY + 1].tolist()))
+
+    def unique_values(self) -> Optional[List[Any]]:
+        """Values in order of appearance, None if there are too many values for a boolean column"""
+        return list(self.values) if len(self.values) <= BOOLEAN_VALUES_CAPACITY else None
+
+
+def sample_chunks(
+    chunks: Iterable[pd.DataFrame], sample_rows: int = 0, sample_fraction: float = 0, seed: int = 42
+) -> Tuple[pd.DataFrame, Dict[str, ColumnBounds], int]:
+    """Sample the rows of a table in one pass over its chunks, and track the exact bounds of each column on all rows
+
+    Returns the sample, the bounds of each column and the total number of rows
+    """
+    sampler = RowSampler(sample_rows, sample_fraction, seed)
+    bounds: Dict[str, ColumnBounds] = {}
+    for chunk in chunks:
+        sampler.update(chunk)
+        for var_name in chunk.columns:
+            bounds.setdefault(str(var_name), ColumnBounds()).update(chunk[var_name])
+    sample = sampler.sample if sampler.sample is not None else pd.DataFrame()
+    return sample.sort_index().reset_index(drop=True), bounds, sampler.rows_count
@@ -1,5 +1,8 @@
 import logging
-from dataclasses import dataclass
+import re
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Iterable, Iterator, List, TypeVar
 
 log_format = "%(levelname)s: [%(asctime)s] %(message)s [%(module)s:%(funcName)s]"
 log = logging.getLogger(__name__)
@@ -14,6 +17,40 @@ RED = "\033[91m"
 YELLOW = "\033[33m"
 CYAN = "\033[36m"
 
+T = TypeVar("T")
+
+# Non-standard namespace used to add information specific to csvw-ontomap to the CSVW metadata
+ONTOMAP_NAMESPACE = "https://github.com/vemonet/csvw-ontomap#"
+
+# FastEmbed model used to embed the ontology labels and the columns
+DEFAULT_EMBEDDING_MODEL = "BAAI/bge-base-en"
+
+# Predicates of the ontology terms labels that are embedded in the VectorDB
+TERM_LABEL_PREDICATES = [
+    "http://www.w3.org/2000/01/rdf-schema#label",
+    "http://www.w3.org/2004/02/skos/core#prefLabel",
+    "http://www.w3.org/2004/02/skos/core#altLabel",
+    "http://www.w3.org/2004/02/skos/core#definition",
+    "http://www.w3.org/2000/01/rdf-schema#comment",
+    "http://purl.org/dc/terms/description",
+    "http://purl.org/dc/elements/1.1/title",
+]
+
+
+def batched(iterable: Iterable[T], size: int) -> Iterator[List[T]]:
+    """Split an iterable in lists of `size` elements, the last list can be smaller"""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def separate_words(input_string: str) -> str:
+    """Separate words in column labels (e.g. RestingECG becomes Resting ECG)"""
+    # Replace underscores with spaces for snake_case
+    input_string = input_string.replace("_", " ")
+    # Insert spaces before capital letters for CamelCase
+    return re.sub(r"(?<=[a-z])(?=[A-Z])", " ", input_string)
+
 
 @dataclass
 class OntomapConfig:
@@ -21,6 +58,45 @@ class OntomapConfig:
     """Number of best matches to add to each column as rdfs:comment"""
     search_threshold: float = 0
     """Do not add propertyUrl if the match score is under this threshold, between 0 and 1"""
+    profiling_engine: str = "full"
+    """Engine used to profile the columns: full (ydata-profiling) or fast (only compute what is needed for CSVW)"""
+    chunk_size: int = 0
+    """Profile CSV files in streaming by chunks of this number of rows, 0 to load the whole file in memory"""
+    workers: int = 1
+    """Number of processes used to profile files in parallel"""
+    lexical_match: bool = True
+    """Match columns to ontology labels equal after normalization before using the vector search"""
+    lexical_weight: float = 0.3
+    """Weight of the words overlap with the label in the score of vector search matches, between 0 and 1"""
+    term_types: List[str] = field(default_factory=list)
+    """Only map columns to ontology terms of these types: class, property, or URIs of types. All types when empty"""
+    embedding_model: str = DEFAULT_EMBEDDING_MODEL
+    """FastEmbed model used to embed the labels and columns, e.g. BAAI/bge-small-en-v1.5 for 384 dimensions instead of 768"""
+    quantization: str = "none"
+    """Quantization of the vectors in the VectorDB: none, scalar (int8, 4x smaller) or product (16x smaller)"""
+    vectors_on_disk: bool = False
+    """Store the original vectors on disk, memory-mapped, instead of in RAM"""
+    vectordb_url: str = ""
+    """URL of a Qdrant server storing the vectors, instead of the local VectorDB. Quantization and on-disk vectors are
+    only used by Qdrant servers"""
+    embedding_cache_size: int = 1_000_000
+    """Maximum number of embeddings kept in the cache stored in the VectorDB folder, 0 to disable the cache"""
+    ingest_workers: int = 1
+    """Number of ontologies parsed at the same time, and of processes used to embed their labels"""
+    report_metrics: bool = False
+    """Add the time and memory used by each stage to the CSVW metadata, under a non-standard csvw-ontomap property"""
+    sample_rows: int = 0
+    """Profile a uniform sample of this number of rows, taken in one pass, 0 to profile all rows"""
+    sample_fraction: float = 0
+    """Profile a sample of this fraction of the rows, between 0 and 1, 0 to profile all rows"""
+    sample_seed: int = 42
+    """Seed of the random sampling of rows"""
+    columns: List[str] = field(default_factory=list)
+    """Only profile these columns, the other columns are not loaded. All columns when empty"""
+    label_predicates: List[str] = field(default_factory=lambda: list(TERM_LABEL_PREDICATES))
+    """Predicates of the ontology terms labels embedded in the VectorDB"""
+    profile_cache: str = ""
+    """Path to the SQLite cache of the profiled tables, reused for files that did not change. Disabled when empty"""
     # many_times: int = field(default_factory=lambda: int(os.environ.get("MANY_TIMES", "2")))
 
 
@@ -0,0 +1,73 @@
+"""Write CSVW metadata table by table, as a JSON document or as JSON Lines."""
+import json
+from types import TracebackType
+from typing import Any, Dict, Optional, TextIO, Type, Union
+
+INDENT = "  "
+
+
+class CsvwWriter:
+    """Write the tables of a CSVW document to a file as soon as they are generated, without keeping them in memory
+
+    The JSON output is the same document as dumping the whole metadata with `json.dumps(indent=2)`, the properties
+    of the document are written before the tables, and the ones added to `properties` after them when closing.
+    With `json_lines` each line is the metadata of one table, with the `@context` of the document.
+    Used as a context manager, the document is only closed when no exception was raised
+    """
+
+    def __init__(self, output: Union[str, TextIO], header: Dict[str, Any], json_lines: bool = False) -> None:
+        self.file = open(output, "w") if isinstance(output, str) else output  # noqa: SIM115
+        self.close_file = isinstance(output, str)
+        self.header = header
+        self.json_lines = json_lines
+        self.properties: Dict[str, Any] = {}
+        self.tables_count = 0
+        self.closed = False
+        if not json_lines:
+            self.file.write("{")
+            for key, value in header.items():
+                self.file.write(f"\n{INDENT}{json.dumps(key)}: {dump_indented(value, 1)},")
+            self.file.write(f'\n{INDENT}"tables": [')
+
+    def write_table(self, table: Any) -> None:
+        if self.json_lines:
+            self.file.write(json.dumps({"@context": self.header.get("@context"), **table}) + "\n")
+        else:
+            separator = "," if self.tables_count else ""
+            self.file.write(f"{separator}\n{INDENT * 2}{dump_indented(table, 2)}")
+        self.tables_count += 1
+        self.file.flush()
+
+    def close(self) -> None:
+        """Write the properties added after the tables and close the document, the properties are not in JSON Lines"""
+        if self.closed:
+            return
+        self.closed = True
+        if not self.json_lines:
+            self.file.write(f"\n{INDENT}]" if self.tables_count else "]")
+            for key, value in self.properties.items():
+                self.file.write(f",\n{INDENT}{json.dumps(key)}: {dump_indented(value, 1)}")
+            self.file.write("\n}\n")
+        self.file.flush()
+        if self.close_file:
+            self.file.close()
+
+    def __enter__(self) -> "CsvwWriter":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        if exc_type is None:
+            self.close()
+        elif self.close_file:
+            # Leave the document unfinished, so it is not mistaken for a complete one
+            self.file.close()
+
+
+def dump_indented(value: Any, level: int) -> str:
+    """Dump a value to JSON indented by 2 spaces, nested at the given indentation level"""
+    return json.dumps(value, indent=2).replace("\n", "\n" + INDENT * level)
@@ -0,0 +1,412 @@
+"""Offline benchmark of the profiling, ontology ingestion and column search.
+
+Synthetic CSV files and OWL ontologies are generated, and a stub embedding model is used, so no network is needed
+(real FastEmbed models can be compared with --fastembed-models).
+Run it from the root of the repository, and compare the JSON results across commits:
+
+    python -m tests.benchmark --rows 100000 --classes 5000 -o bench-results.json
+"""
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+import urllib.request
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Set
+
+import numpy as np
+import pandas as pd
+import typer
+
+from csvw_ontomap import CsvwProfiler, OntomapConfig, __version__
+from csvw_ontomap.ontology import (
+    COLLECTION_NAME,
+    EMBEDDING_MODEL_SIZE,
+    OntologySearcher,
+    get_embedding_size,
+    get_model_name,
+    get_vectordb_client,
+)
+from csvw_ontomap.utils import DEFAULT_EMBEDDING_MODEL, separate_words
+
+from .helpers import StubEmbedding
+
+# Words used to generate the labels of the ontology terms, and the names of the columns
+VOCABULARY = [
+    "patient", "birth", "date", "age", "gender", "heart", "rate", "blood", "pressure", "cholesterol", "glucose",
+    "weight", "height", "visit", "hospital", "drug", "dose", "exposure", "condition", "procedure", "measurement",
+    "observation", "death", "cause", "care", "site", "provider", "specialty", "location", "country", "city", "zip",
+    "code", "value", "unit", "range", "low", "high", "start", "end", "status", "type", "source", "concept", "name",
+    "family", "history", "smoking", "alcohol", "diagnosis",
+]  # fmt: skip
+
+# Embedding model, quantization and on-disk storage of the vector setups compared to the full precision one
+VECTOR_SETUPS = {
+    "full": ("default", "none", False),
+    "scalar": ("default", "scalar", False),
+    "product": ("default", "product", False),
+    "on_disk": ("default", "none", True),
+    "small_model": ("small", "none", False),
+}
+# FastEmbed models compared with --fastembed-models, which requires downloading them
+FASTEMBED_MODELS = {"default": DEFAULT_EMBEDDING_MODEL, "small": "BAAI/bge-small-en-v1.5"}
+RECALL_LIMIT = 10
+
+cli = typer.Typer()
+
+
+def generate_label(rng: np.random.Generator, words: int = 2) -> str:
+    return " ".join(rng.choice(VOCABULARY, size=words, replace=False))
+
+
+def generate_csv(
+    path: str, rows: int = 10000, numeric: int = 4, categorical: int = 4, boolean: int = 2, seed: int = 42
+) -> List[str]:
+    """Generate a CSV file with numeric, categorical and boolean columns, returns the names of the columns"""
+    rng = np.random.default_rng(seed)
+    columns: Dict[str, Any] = {}
+    for i in range(numeric):
+        name = f"{generate_label(rng).title().replace(' ', '')}{i}"
+        columns[name] = rng.normal(50, 20, rows).round(2) if i % 2 else rng.integers(0, 1000, rows)
+    for i in range(categorical):
+        categories = [f"cat{j}" for j in range(2 + i * 3)]
+        columns[f"{generate_label(rng).replace(' ', '_')}_{i}"] = rng.choice(categories, rows)
+    for i in range(boolean):
+        columns[f"{generate_label(rng).title().replace(' ', '')}Flag{i}"] = rng.choice(["true", "false"], rows)
+    pd.DataFrame(columns).to_csv(path, index=False)
+    return list(columns)
+
+
+def generate_ontology(path: str, classes: int = 1000, properties: int = 1000, seed: int = 42) -> int:
+    """Generate an OWL ontology in turtle with labelled and commented classes and properties, returns its labels count"""
+    rng = np.random.default_rng(seed)
+    with open(path, "w") as file:
+        file.write(
+            "@prefix owl: <http://www.w3.org/2002/07/owl#> .\n"
+            "@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .\n"
+            "@prefix ex: <http://example.org/bench/> .\n\n"
+        )
+        for i in range(classes + properties):
+            term_type = "owl:Class" if i < classes else "owl:DatatypeProperty"
+            file.write(
+                f'ex:term{i} a {term_type} ; rdfs:label "{generate_label(rng)}" ; '
+                f'rdfs:comment "The {generate_label(rng, 4)} of the record {i}" .\n'
+            )
+    return (classes + properties) * 2
+
+
+def timed(func: Callable[..., Any], *args: Any, **kwargs: Any) -> float:
+    """Get the time in seconds taken to run a function"""
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def bench_profiling(csv_path: str, rows: int, cols: int, engines: List[str], chunk_size: int) -> Dict[str, Any]:
+    """Measure the throughput of `profile_files` for each profiling engine, and in streaming by chunks"""
+    configs = {engine: OntomapConfig(profiling_engine=engine) for engine in engines}
+    if chunk_size > 0:
+        configs["streaming"] = OntomapConfig(chunk_size=chunk_size)
+    results = {}
+    for name, config in configs.items():
+        seconds = timed(CsvwProfiler(config=config).profile_files, [csv_path])
+        results[name] = {
+            "seconds": seconds,
+            "rows_per_second": rows / seconds,
+            "cells_per_second": rows * cols / seconds,
+        }
+    return results
+
+
+def bench_ingestion(searcher: OntologySearcher, onto_path: str, labels: int) -> Dict[str, Any]:
+    """Measure the ingestion rate of an ontology in the VectorDB, and the time to skip it when it did not change"""
+    seconds = timed(searcher.load, [onto_path])
+    skip_seconds = timed(searcher.load, [onto_path])
+    return {"labels": labels, "seconds": seconds, "labels_per_second": labels / seconds, "skip_seconds": skip_seconds}
+
+
+def bench_search(searcher: OntologySearcher, queries: List[str], repeat: int) -> Dict[str, Any]:
+    """Measure the latency of searching columns one by one, and the throughput of searching them in batch"""
+    results = {}
+    for name, lexical_match in [("lexical", True), ("vector", False)]:
+        latencies = [timed(searcher.search, [query], 3, lexical_match) for _ in range(repeat) for query in queries]
+        batch_seconds = timed(searcher.search, queries, 3, lexical_match)
+        results[name] = {
+            "queries": len(queries),
+            "latency_ms_mean": statistics.mean(latencies) * 1000,
+            "latency_ms_p50": np.percentile(latencies, 50) * 1000,
+            "latency_ms_p95": np.percentile(latencies, 95) * 1000,
+            "batch_queries_per_second": len(queries) / batch_seconds,
+        }
+    return results
+
+
+def bench_vectors(
+    onto_path: str,
+    queries: List[str],
+    repeat: int,
+    workdir: str,
+    vectordb_url: str = "",
+    fastembed_models: bool = False,
+) -> Dict[str, Any]:
+    """Compare the recall, search latency and memory of each vector setup with the full precision setup
+
+    The recall is the share of the top matches of the full precision setup found with the same query by each setup.
+    The memory is the resident memory added by loading the vectors: of the Qdrant server (`vectordb_url`), or of this
+    process when opening the local VectorDB.
+
+    The stub model is used unless `fastembed_models` is set, its results are marked as synthetic: the recall only
+    reflects the hashed words of the labels, and the smaller model is not compared. The local VectorDB does not
+    quantize vectors, the scalar quantization is simulated with numpy, and the product quantization and on-disk
+    vectors are skipped without a Qdrant server
+    """
+    results: Dict[str, Any] = {}
+    reference: List[Set[str]] = []
+    models: Dict[str, Any] = {}
+    full_path = ""
+    for name, (model, quantization, on_disk) in VECTOR_SETUPS.items():
+        if model == "small" and not fastembed_models:
+            results[name] = {"skipped": "Smaller models are only compared with real models (--fastembed-models)"}
+            continue
+        if not vectordb_url and (quantization == "product" or on_disk):
+            results[name] = {"skipped": "Product quantization and on-disk vectors require a Qdrant server"}
+            continue
+        if model not in models and not fastembed_models:
+            models[model] = StubEmbedding(EMBEDDING_MODEL_SIZE)
+        if not vectordb_url and quantization == "scalar":
+            # Quantize the vectors of the full precision setup, with its model
+            vectordb = get_vectordb_client(full_path, "")
+            results[name] = bench_local_scalar(vectordb, models[model], queries, repeat)
+            results[name]["synthetic"] = not fastembed_models
+            vectordb.close()
+            continue
+        vectordb_path = os.path.join(workdir, f"vectordb-{name}")
+        full_path = full_path if full_path else vectordb_path
+        # The FastEmbed models are loaded by the first setup using them
+        searcher = OntologySearcher(
+            vectordb_path,
+            embedding_model=models.get(model),
+            cache_size=0,
+            model_name=FASTEMBED_MODELS[model],
+            quantization=quantization,
+            on_disk=on_disk,
+            vectordb_url=vectordb_url,
+        )
+        models[model] = searcher.embedding_model
+        memory_before: Optional[float] = None
+        if vectordb_url:
+            # The collection of a Qdrant server is shared by all setups, it is deleted to measure the memory it uses
+            searcher.vectordb.delete_collection(COLLECTION_NAME)
+            memory_before = get_memory_mb(vectordb_url)
+        searcher.load([onto_path])
+        searcher.vectordb.close()
+
+        # Measure the memory allocated to open the VectorDB (tracing slows it down), then the time of a cold search
+        tracemalloc.start()
+        searcher.vectordb = get_vectordb_client(vectordb_path, vectordb_url)
+        open_memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        searcher.vectordb.close()
+        if not vectordb_url:
+            memory_before = get_memory_mb(vectordb_url)
+        start = time.perf_counter()
+        searcher.vectordb = get_vectordb_client(vectordb_path, vectordb_url)
+        searcher.search(queries[:1], RECALL_LIMIT, False)
+        open_seconds = time.perf_counter() - start
+        memory_after = get_memory_mb(vectordb_url)
+        latencies = [timed(searcher.search, [query], RECALL_LIMIT, False) for _ in range(repeat) for query in queries]
+        matches = [{match.payload["id"] for match in m} for m in searcher.search(queries, RECALL_LIMIT, False)]
+        searcher.vectordb.close()
+
+        reference = reference if reference else matches
+        recalls = [len(found & expected) / len(expected) for found, expected in zip(matches, reference) if expected]
+        # None when the resident memory is not available: not on Linux, or not exposed by the Qdrant server
+        memory = memory_after - memory_before if memory_after is not None and memory_before is not None else None
+        results[name] = {
+            "model": get_model_name(searcher.embedding_model),
+            "synthetic": not fastembed_models,
+            "size": get_embedding_size(searcher.embedding_model),
+            "quantization": quantization,
+            "on_disk": on_disk,
+            "recall": statistics.mean(recalls) if recalls else 0.0,
+            "latency_ms_p50": np.percentile(latencies, 50) * 1000,
+            "latency_ms_p95": np.percentile(latencies, 95) * 1000,
+            "open_seconds": open_seconds,
+            "open_memory_mb": open_memory / (1024 * 1024),
+            "memory_mb": memory,
+        }
+    return results
+
+
+def bench_local_scalar(vectordb: Any, embedding_model: Any, queries: List[str], repeat: int) -> Dict[str, Any]:
+    """Compare int8 scalar quantization with the full precision vectors of a local VectorDB
+
+    The normalized vectors are quantized with one scale for all values, like Qdrant, and searched with numpy
+    without rescoring. The memory is the size of the quantized vectors, and of the original ones. The latency is the
+    one of numpy, it is not comparable with the searches of the VectorDB
+    """
+    vectors = np.array(get_all_vectors(vectordb), dtype=np.float32)
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    low, high = float(vectors.min()), float(vectors.max())
+    scale = (high - low) / 255 if high > low else 1.0
+    quantized = np.round((vectors - low) / scale).astype(np.uint8)
+    query_vectors = np.array(list(embedding_model.embed(queries)), dtype=np.float32)
+    query_vectors /= np.maximum(np.linalg.norm(query_vectors, axis=1, keepdims=True), 1e-12)
+    limit = min(RECALL_LIMIT, len(vectors))
+
+    def search_quantized(query: Any) -> Any:
+        # Dot product with the dequantized vectors: scale * quantized + low
+        scores = scale * (quantized @ query) + low * query.sum()
+        return np.argpartition(-scores, limit - 1)[:limit]
+
+    latencies = [timed(search_quantized, query) for _ in range(repeat) for query in query_vectors]
+    recalls = [
+        len(set(search_quantized(query)) & set(np.argpartition(-(vectors @ query), limit - 1)[:limit])) / limit
+        for query in query_vectors
+    ]
+    return {
+        "model": get_model_name(embedding_model),
+        "size": vectors.shape[1],
+        "quantization": "scalar",
+        "on_disk": False,
+        "local_simulation": True,
+        "recall": statistics.mean(recalls) if recalls else 0.0,
+        "latency_ms_p50": np.percentile(latencies, 50) * 1000,
+        "latency_ms_p95": np.percentile(latencies, 95) * 1000,
+        "memory_mb": quantized.nbytes / (1024 * 1024),
+        "full_memory_mb": vectors.nbytes / (1024 * 1024),
+    }
+
+
+def get_all_vectors(vectordb: Any) -> List[Any]:
+    """Get the vectors of all the points of the collection"""
+    vectors: List[Any] = []
+    offset = None
+    while True:
+        points, offset = vectordb.scroll(
+            collection_name=COLLECTION_NAME, limit=10000, offset=offset, with_payload=False, with_vectors=True
+        )
+        vectors.extend(point.vector for point in points)
+        if offset is None:
+            return vectors
+
+
+def get_memory_mb(vectordb_url: str = "") -> Optional[float]:
+    """Get the resident memory of the Qdrant server at `vectordb_url` from its Prometheus metrics, or of this process"""
+    if vectordb_url:
+        with urllib.request.urlopen(f"{vectordb_url.rstrip('/')}/metrics") as response:  # noqa: S310
+            for line in response.read().decode().splitlines():
+                if line.startswith("memory_resident_bytes "):
+                    return float(line.split()[1]) / (1024 * 1024)
+        return None
+    # Only available on Linux
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def get_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True  # noqa: S607
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def run_benchmark(
+    rows: int = 10000,
+    numeric: int = 4,
+    categorical: int = 4,
+    boolean: int = 2,
+    classes: int = 1000,
+    properties: int = 1000,
+    engines: Optional[List[str]] = None,
+    chunk_size: int = 5000,
+    repeat: int = 3,
+    workdir: Optional[str] = None,
+    vectordb_url: str = "",
+    fastembed_models: bool = False,
+) -> Dict[str, Any]:
+    """Generate the synthetic data and run all benchmarks, returns the results as a dict"""
+    engines = engines if engines else ["fast"]
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp_dir:
+        csv_path = os.path.join(tmp_dir, "bench.csv")
+        onto_path = os.path.join(tmp_dir, "bench.ttl")
+        columns = generate_csv(csv_path, rows, numeric, categorical, boolean)
+        labels = generate_ontology(onto_path, classes, properties)
+        searcher = OntologySearcher(os.path.join(tmp_dir, "vectordb"), embedding_model=StubEmbedding())
+        queries = [separate_words(col) for col in columns]
+        results = {
+            "profiling": bench_profiling(csv_path, rows, len(columns), engines, chunk_size),
+            "ingestion": bench_ingestion(searcher, onto_path, labels),
+            "search": bench_search(searcher, queries, repeat),
+        }
+        searcher.vectordb.close()
+        results["vectors"] = bench_vectors(onto_path, queries, repeat, tmp_dir, vectordb_url, fastembed_models)
+    return {
+        "date": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "commit": get_commit(),
+        "version": __version__,
+        "python": platform.python_version(),
+        "params": {
+            "rows": rows,
+            "numeric": numeric,
+            "categorical": categorical,
+            "boolean": boolean,
+            "classes": classes,
+            "properties": properties,
+            "chunk_size": chunk_size,
+            "repeat": repeat,
+            "vectordb": vectordb_url if vectordb_url else "local",
+            "vectors_model": "fastembed" if fastembed_models else "stub",
+        },
+        "results": results,
+    }
+
+
+@cli.command()
+def main(
+    rows: int = typer.Option(10000, help="Number of rows of the generated CSV"),
+    numeric: int = typer.Option(4, help="Number of numeric columns"),
+    categorical: int = typer.Option(4, help="Number of categorical columns"),
+    boolean: int = typer.Option(2, help="Number of boolean columns"),
+    classes: int = typer.Option(1000, help="Number of classes of the generated ontology"),
+    properties: int = typer.Option(1000, help="Number of properties of the generated ontology"),
+    engine: List[str] = typer.Option(["fast"], help="Profiling engines to benchmark: fast and/or full"),
+    chunk_size: int = typer.Option(5000, help="Chunk size to benchmark profiling in streaming, 0 to skip"),
+    repeat: int = typer.Option(3, help="Number of times each column is searched to measure the latency"),
+    vectordb_url: str = typer.Option(None, help="URL of a Qdrant server to benchmark the quantized vectors"),
+    fastembed_models: bool = typer.Option(
+        False, help="Compare the vector setups with real FastEmbed models, downloaded, instead of the stub model"
+    ),
+    output: str = typer.Option(None, "-o", help="Path to save the JSON results"),
+) -> None:
+    results = run_benchmark(
+        rows,
+        numeric,
+        categorical,
+        boolean,
+        classes,
+        properties,
+        engine,
+        chunk_size,
+        repeat,
+        workdir=None,
+        vectordb_url=vectordb_url if vectordb_url else "",
+        fastembed_models=fastembed_models,
+    )
+    if output:
+        with open(output, "w") as file:
+            json.dump(results, file, indent=2)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,35 @@
+"""Ontology and embedding model shared by the tests and the benchmark, to run them offline."""
+import hashlib
+from typing import Any, Iterable, List
+
+import numpy as np
+
+from csvw_ontomap.ontology import EMBEDDING_MODEL_SIZE
+
+ONTOLOGY_TTL = """@prefix owl: <http://www.w3.org/2002/07/owl#> .
+@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
+@prefix ex: <http://example.org/> .
+
+ex:Person a owl:Class ; rdfs:label "person" .
+ex:Gender a owl:Class ; rdfs:label "gender" .
+ex:birthDate a owl:DatatypeProperty ; rdfs:label "birth date" .
+ex:hasAge a owl:DatatypeProperty ; rdfs:label "age" .
+"""
+
+
+class StubEmbedding:
+    """Embed texts as bag of hashed words, to test without downloading a model"""
+
+    def __init__(self, embedding_size: int = EMBEDDING_MODEL_SIZE) -> None:
+        self.calls: List[List[str]] = []
+        self.embedding_size = embedding_size
+        self.model_name = "stub" if embedding_size == EMBEDDING_MODEL_SIZE else f"stub-{embedding_size}"
+
+    def embed(self, texts: Iterable[str]) -> Iterable[Any]:
+        texts = list(texts)
+        self.calls.append(texts)
+        for text in texts:
+            vector = np.zeros(self.embedding_size, dtype=np.float32)
+            for word in text.lower().split():
+                vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % self.embedding_size] += 1  # noqa: S324
+            yield vector
@@ -0,0 +1,17 @@
+from .benchmark import run_benchmark
+
+
+def test_benchmark(tmp_path):
+    """Test the benchmark runs offline on small synthetic data, and reports the measures of each stage"""
+    results = run_benchmark(rows=200, classes=20, properties=20, chunk_size=50, repeat=1, workdir=str(tmp_path))
+    assert set(results["results"]["profiling"]) == {"fast", "streaming"}
+    assert results["results"]["ingestion"]["labels"] == 80
+    assert results["results"]["search"]["lexical"]["queries"] == 10
+    vectors = results["results"]["vectors"]
+    assert vectors["full"]["recall"] == 1
+    # The scalar quantization is simulated locally, the other setups require a Qdrant server or real models
+    assert vectors["scalar"]["local_simulation"]
+    assert 0 < vectors["scalar"]["recall"] <= 1
+    assert vectors["scalar"]["memory_mb"] == vectors["scalar"]["full_memory_mb"] / 4
+    assert {name for name, setup in vectors.items() if "skipped" in setup} == {"product", "on_disk", "small_model"}
+    assert all(setup["synthetic"] for setup in vectors.values() if "skipped" not in setup)
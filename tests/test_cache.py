@@ -0,0 +1,32 @@
+import numpy as np
+
+from csvw_ontomap.cache import CachedEmbedding, EmbeddingCache
+
+from .helpers import StubEmbedding
+
+
+def test_embedding_cache_lru(tmp_path):
+    """Test the embedding cache is persisted, and evicts the least recently used embeddings"""
+    cache = EmbeddingCache(str(tmp_path), "stub", max_size=2)
+    cache.put_many(["name", "age"], [np.ones(4), np.full(4, 2.0)])
+    # Use "name" so that "age" is the least recently used
+    assert cache.get_many(["name "])[0] is not None
+    cache.put_many(["gender"], [np.full(4, 3.0)])
+    assert len(cache) == 2
+
+    reopened = EmbeddingCache(str(tmp_path), "stub", max_size=2)
+    name, age, gender = reopened.get_many(["name", "age", "gender"])
+    assert age is None
+    assert np.array_equal(name, np.ones(4))
+    assert np.array_equal(gender, np.full(4, 3.0))
+
+
+def test_cached_embedding(tmp_path):
+    """Test only texts missing from the cache are embedded"""
+    model = StubEmbedding()
+    cached_model = CachedEmbedding(model, EmbeddingCache(str(tmp_path), model.model_name))
+    first = cached_model.embed(["date of birth", "name"])
+    second = cached_model.embed(["name", "identifier", "date  of birth"])
+    assert model.calls == [["date of birth", "name"], ["identifier"]]
+    assert np.array_equal(first[1], second[0])
+    assert np.array_equal(first[0], second[2])
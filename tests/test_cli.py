@@ -1,10 +1,61 @@
+import json
+import subprocess
+import sys
+
 from typer.testing import CliRunner
 
 from csvw_ontomap.__main__ import cli
 
 runner = CliRunner()
 
+# Maximum time to import the CLI, in seconds
+IMPORT_TIME_BUDGET = 1.0
+HEAVY_MODULES = ["pandas", "ydata_profiling", "fastembed", "qdrant_client", "rdflib"]
+
 
 def test_cli():
     result = runner.invoke(cli, ["--help"])
     assert result.exit_code == 0
+
+
+def test_cli_json_lines_stdout():
+    """Test the progress is not mixed with the tables when they are written to stdout as JSON Lines"""
+    result = runner.invoke(cli, ["tests/resources/heart.csv", "--engine", "fast", "--json-lines"])
+    assert result.exit_code == 0
+    tables = [json.loads(line) for line in result.stdout.splitlines()]
+    assert tables[0]["url"] == "tests/resources/heart.csv"
+    assert "Profiling" in result.stderr
+
+
+def run_python(code: str) -> subprocess.CompletedProcess:
+    return subprocess.run(  # noqa: S603
+        [sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, check=True
+    )
+
+
+def test_cli_import_time():
+    """Test the CLI is imported within the time budget, without importing the heavy dependencies"""
+    result = run_python(f"import sys, csvw_ontomap.__main__; print([m for m in {HEAVY_MODULES} if m in sys.modules])")
+    assert result.stdout.strip() == "[]"
+    # The last line of the import time report is the cumulative time of the CLI module, in microseconds
+    cumulative_us = int(result.stderr.strip().splitlines()[-1].split("|")[1])
+    assert cumulative_us / 1e6 < IMPORT_TIME_BUDGET
+
+
+def test_profile_without_ontology_imports():
+    """Test the ontology stack and ydata-profiling are not imported when they are not used"""
+    result = run_python(
+        "import sys\n"
+        "from csvw_ontomap import CsvwProfiler, OntomapConfig\n"
+        "CsvwProfiler(config=OntomapConfig(profiling_engine='fast')).profile_files(['tests/resources/heart.csv'])\n"
+        f"print([m for m in {HEAVY_MODULES} if m in sys.modules])"
+    )
+    assert result.stdout.strip().splitlines()[-1] == "['pandas']"
+
+
+def test_cli_stats_stderr():
+    """Test the summary of the stages is not written in the metadata printed to stdout"""
+    result = runner.invoke(cli, ["tests/resources/heart.csv", "--engine", "fast", "--stats"])
+    assert result.exit_code == 0
+    assert json.loads(result.stdout)["tables"][0]["url"] == "tests/resources/heart.csv"
+    assert "profile_files" in result.stderr
@@ -0,0 +1,241 @@
+from typing import Set
+
+import pytest
+from rdflib import OWL, RDFS, SKOS, Graph
+
+from csvw_ontomap import CsvwProfiler, OntomapConfig, ontology
+from csvw_ontomap.ontology import (
+    COLLECTION_NAME,
+    EMBEDDING_MODEL_SIZE,
+    OntologySearcher,
+    extract_terms,
+    get_onto_point_ids,
+    get_onto_vectors_count,
+    get_quantization_config,
+)
+
+from .helpers import ONTOLOGY_TTL, StubEmbedding
+
+
+@pytest.fixture()
+def onto_file(tmp_path):
+    onto_file = tmp_path / "onto.ttl"
+    onto_file.write_text(ONTOLOGY_TTL)
+    return onto_file
+
+
+@pytest.fixture()
+def searcher(tmp_path, onto_file):
+    model = StubEmbedding()
+    searcher = OntologySearcher(str(tmp_path / "vectordb"), embedding_model=model)
+    searcher.load([str(onto_file)])
+    model.calls = []
+    return searcher, model
+
+
+def test_searcher_batch_search(searcher):
+    """Test the searcher embeds all queries in one batch, and returns results in the queries order"""
+    searcher, model = searcher
+    results = searcher.search(["Gender", "Birth Date", "Age"], 2, lexical_match=False)
+    assert len(model.calls) == 1
+    assert [matches[0].payload["id"] for matches in results] == [
+        "http://example.org/Gender",
+        "http://example.org/birthDate",
+        "http://example.org/hasAge",
+    ]
+    assert all(len(matches) == 2 for matches in results)
+
+
+def test_searcher_lexical_match(searcher):
+    """Test queries matching a label after normalization are resolved without embedding them"""
+    searcher, model = searcher
+    results = searcher.search(["gender", "Birth_Date", "date, birth", "patient age"], 1)
+    assert model.calls == [["patient age"]]
+    assert [(matches[0].payload["id"], matches[0].source) for matches in results] == [
+        ("http://example.org/Gender", "exact"),
+        ("http://example.org/birthDate", "exact"),
+        ("http://example.org/birthDate", "near-exact"),
+        ("http://example.org/hasAge", "vector"),
+    ]
+    assert results[0][0].score == 1
+    assert results[3][0].score < 1
+
+
+def test_searcher_scoped_search(tmp_path):
+    """Test only the ontologies loaded by the searcher are searched, and optionally only terms of some types"""
+    onto_files = [tmp_path / "onto.ttl", tmp_path / "other.ttl"]
+    onto_files[0].write_text(ONTOLOGY_TTL)
+    onto_files[1].write_text(ONTOLOGY_TTL.replace("example.org", "example.com"))
+    searcher = OntologySearcher(str(tmp_path / "vectordb"), embedding_model=StubEmbedding())
+    searcher.load([str(onto_files[1])])
+    searcher.load([str(onto_files[0])])
+    for lexical_match in [True, False]:
+        matches = searcher.search(["gender", "birth date"], 4, lexical_match)
+        assert all(
+            match.payload["ontology"] == str(onto_files[0]) for query_matches in matches for match in query_matches
+        )
+
+    matches = searcher.search(["gender"], 4, lexical_match=False, term_types=["property"])[0]
+    assert matches
+    assert {match.payload["type"] for match in matches} <= {str(OWL.DatatypeProperty), str(OWL.ObjectProperty)}
+    assert searcher.search(["gender"], 1, term_types=[str(OWL.Class)])[0][0].source == "exact"
+    assert searcher.search(["gender"], 1, term_types=["property"])[0][0].source == "vector"
+
+
+def test_searcher_metrics(searcher):
+    """Test the ontology loading and search stages record the embeddings computed and the cache hits"""
+    searcher, _model = searcher
+    searcher.search(["gender", "person", "patient age"], 1)
+    metrics = searcher.metrics.to_dict()
+    assert metrics["parse_ontology"]["ontologies"] == 1
+    assert metrics["embed_labels"]["embeddings"] == 4
+    assert metrics["upsert"]["points"] == 4
+    assert metrics["index_labels"]["labels"] == 4
+    assert metrics["lexical_match"]["matched"] == 2
+    assert metrics["embed_queries"]["queries"] == 1
+
+    searcher.search(["patient age"], 1)
+    assert searcher.metrics.to_dict()["embed_queries"]["cache_hits"] == 1
+    assert searcher.metrics.to_dict()["index_labels"]["calls"] == 1
+
+
+def test_load_skip_unchanged_ontology(searcher, onto_file, monkeypatch):
+    """Test ontologies unchanged since they were indexed are not parsed again, and changed ones are reloaded"""
+    searcher, _model = searcher
+    assert get_onto_vectors_count(searcher.vectordb, str(onto_file)) == 4
+
+    parsed = []
+    graph_class = ontology.Graph
+    monkeypatch.setattr(ontology, "Graph", lambda *args, **kwargs: parsed.append(1) or graph_class(*args, **kwargs))
+    searcher.load([str(onto_file)])
+    assert parsed == []
+
+    onto_file.write_text(ONTOLOGY_TTL + 'ex:Sex a owl:Class ; rdfs:label "sex" .\n')
+    searcher.load([str(onto_file)])
+    assert parsed == [1]
+    assert get_onto_vectors_count(searcher.vectordb, str(onto_file)) == 5
+
+    searcher.load([str(onto_file)], refresh=True)
+    assert parsed == [1, 1]
+    assert get_onto_vectors_count(searcher.vectordb, str(onto_file)) == 5
+
+
+def test_searcher_manifests_hash(searcher, onto_file):
+    """Test the hash of the loaded ontologies manifests changes when an ontology is reindexed"""
+    searcher, _model = searcher
+    first_hash = searcher.get_manifests_hash()
+    searcher.load([str(onto_file)])
+    assert searcher.get_manifests_hash() == first_hash
+    onto_file.write_text(ONTOLOGY_TTL + 'ex:Sex a owl:Class ; rdfs:label "sex" .\n')
+    searcher.load([str(onto_file)])
+    assert searcher.get_manifests_hash() != first_hash
+
+
+def test_load_incremental_ontology(searcher, onto_file):
+    """Test only new labels are embedded when an ontology changes, and removed labels are deleted"""
+    searcher, model = searcher
+    first_ids = get_onto_point_ids(searcher.vectordb, str(onto_file))
+
+    onto_file.write_text(ONTOLOGY_TTL.replace('rdfs:label "person"', 'rdfs:label "human"'))
+    searcher.load([str(onto_file)])
+    assert model.calls == [["human"]]
+    new_ids = get_onto_point_ids(searcher.vectordb, str(onto_file))
+    assert len(new_ids) == 4
+    assert len(new_ids & first_ids) == 3
+    assert searcher.search(["human"], 1)[0][0].payload["label"] == "human"
+
+
+def test_load_resume_interrupted(tmp_path, onto_file, monkeypatch):
+    """Test labels are uploaded by batches, and an interrupted load only embeds the remaining labels"""
+    monkeypatch.setattr(ontology, "EMBED_BATCH_SIZE", 1)
+    model = StubEmbedding()
+    searcher = OntologySearcher(str(tmp_path / "vectordb"), embedding_model=model)
+    embed = model.embed
+
+    def interrupted_embed(texts):
+        if len(model.calls) >= 2:
+            raise KeyboardInterrupt()
+        return embed(texts)
+
+    monkeypatch.setattr(model, "embed", interrupted_embed)
+    with pytest.raises(KeyboardInterrupt):
+        searcher.load([str(onto_file)])
+    assert get_onto_vectors_count(searcher.vectordb, str(onto_file)) == 2
+
+    monkeypatch.setattr(model, "embed", embed)
+    model.calls = []
+    searcher.load([str(onto_file)])
+    assert len(model.calls) == 2
+    assert get_onto_vectors_count(searcher.vectordb, str(onto_file)) == 4
+
+
+def test_load_embedding_size(tmp_path, onto_file):
+    """Test the collection is created with the size of the model embeddings, and recreated when the model changes"""
+    searcher = OntologySearcher(
+        str(tmp_path / "vectordb"), embedding_model=StubEmbedding(384), quantization="scalar", on_disk=True
+    )
+    searcher.load([str(onto_file)])
+    assert searcher.vectordb.get_collection(COLLECTION_NAME).config.params.vectors.size == 384
+    assert searcher.search(["patient age"], 1)[0][0].payload["id"] == "http://example.org/hasAge"
+    searcher.vectordb.close()
+
+    searcher = OntologySearcher(str(tmp_path / "vectordb"), embedding_model=StubEmbedding())
+    searcher.load([str(onto_file)])
+    assert searcher.vectordb.get_collection(COLLECTION_NAME).config.params.vectors.size == EMBEDDING_MODEL_SIZE
+    assert get_onto_vectors_count(searcher.vectordb, str(onto_file)) == 4
+    with pytest.raises(ValueError):
+        get_quantization_config("binary")
+
+
+def test_load_label_predicates(tmp_path):
+    """Test terms are extracted in one pass with their count, and only the configured label predicates are embedded"""
+    onto_file = tmp_path / "onto.ttl"
+    onto_file.write_text(
+        ONTOLOGY_TTL
+        + "@prefix skos: <http://www.w3.org/2004/02/skos/core#> .\n"
+        + 'ex:hasAge skos:prefLabel "age in years" .\nex:Unlabelled a owl:ObjectProperty .\n'
+    )
+    g = Graph()
+    g.parse(str(onto_file))
+    term_uris: Set[str] = set()
+    labels = list(extract_terms(g, [str(RDFS.label)], term_uris))
+    assert len(term_uris) == 5
+    assert {str(term.label) for term in labels} == {"person", "gender", "birth date", "age"}
+
+    searcher = OntologySearcher(str(tmp_path / "vectordb"), embedding_model=StubEmbedding())
+    searcher.load([str(onto_file)], label_predicates=[str(SKOS.prefLabel)])
+    assert get_onto_vectors_count(searcher.vectordb, str(onto_file)) == 1
+    # Only the labels of the configured predicates are matched lexically
+    assert searcher.search(["age in years"], 1)[0][0].source == "exact"
+    assert searcher.search(["gender"], 1)[0][0].source == "vector"
+    searcher.load([str(onto_file)])
+    assert get_onto_vectors_count(searcher.vectordb, str(onto_file)) == 5
+
+
+def test_load_concurrent_ontologies(tmp_path):
+    """Test ontologies are parsed concurrently and their labels embedded in worker processes"""
+    onto_files = [tmp_path / "onto.ttl", tmp_path / "other.ttl"]
+    onto_files[0].write_text(ONTOLOGY_TTL)
+    onto_files[1].write_text(ONTOLOGY_TTL.replace("example.org", "example.com"))
+    model = StubEmbedding()
+    searcher = OntologySearcher(str(tmp_path / "vectordb"), embedding_model=model)
+    searcher.load([str(onto_file) for onto_file in onto_files], ingest_workers=2)
+    # The embeddings are computed by the models of the worker processes
+    assert model.calls == []
+    assert [get_onto_vectors_count(searcher.vectordb, str(onto_file)) for onto_file in onto_files] == [4, 4]
+    assert {match.payload["id"] for match in searcher.search(["gender"], 2)[0]} == {
+        "http://example.org/Gender",
+        "http://example.com/Gender",
+    }
+
+
+def test_profiler_map_columns(searcher):
+    """Test the profiler maps the columns of all tables with the searcher, and keeps the datatype last"""
+    searcher, _model = searcher
+    profiler = CsvwProfiler(config=OntomapConfig(profiling_engine="fast", comment_best_matches=2))
+    profiler.searcher = searcher
+
+    csvw_report = profiler.profile_files(["tests/resources/heart.csv"])
+    age_col = csvw_report["tables"][-1]["tableSchema"]["columns"][0]
+    assert list(age_col.keys()) == ["titles", "dc:title", "propertyUrl", "rdfs:comment", "datatype"]
+    assert age_col["propertyUrl"] == "http://example.org/hasAge"
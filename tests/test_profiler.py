@@ -1,9 +1,15 @@
 import json
-from typing import Any
+import os
+from typing import Any, Dict, List
 
+import pandas as pd
+import pytest
 from csvw import CSVW
 
-from csvw_ontomap import CsvwProfiler, OntomapConfig, __version__
+from csvw_ontomap import CsvwProfiler, OntomapConfig, __version__, profiler, readers
+from csvw_ontomap.cache import ProfileCache
+from csvw_ontomap.metrics import METRICS_PROPERTY
+from csvw_ontomap.profiler import SAMPLING_PROPERTY
 
 ONTOLOGIES = [
     "https://vemonet.github.io/omop-cdm-owl/ontology.owl",
@@ -19,6 +25,248 @@ def test_profiler():
     validate_csvw(csvw_report)
 
 
+def test_profiler_fast_engine():
+    """Test the fast profiling engine generates the same columns as ydata-profiling"""
+    full_report = CsvwProfiler().profile_files(["tests/resources/heart.csv"])
+    full_tables = json.loads(json.dumps(full_report["tables"]))
+    fast_report = CsvwProfiler(config=OntomapConfig(profiling_engine="fast")).profile_files(
+        ["tests/resources/heart.csv"]
+    )
+    validate_csvw(fast_report)
+    assert fast_report["tables"][-1] == full_tables[-1]
+
+
+def test_profiler_streaming():
+    """Test profiling in streaming by chunks generates the same columns as loading the whole file"""
+    fast_report = CsvwProfiler(config=OntomapConfig(profiling_engine="fast")).profile_files(
+        ["tests/resources/heart.csv"]
+    )
+    fast_tables = json.loads(json.dumps(fast_report["tables"]))
+    stream_report = CsvwProfiler(config=OntomapConfig(chunk_size=100)).profile_files(["tests/resources/heart.csv"])
+    validate_csvw(stream_report)
+    assert stream_report["tables"][-1] == fast_tables[-1]
+
+
+def test_profiler_boolean_format(tmp_path):
+    """Test the format of boolean columns starts with the true token, as written in the file"""
+    csv_file = tmp_path / "booleans.csv"
+    csv_file.write_text("flag,answer,bit\n" + "false,N,0\ntrue,Y,1\n" * 10)
+    for config in [OntomapConfig(profiling_engine="fast"), OntomapConfig(profiling_engine="fast", chunk_size=5)]:
+        columns = CsvwProfiler(config=config).profile_files([str(csv_file)])["tables"][-1]["tableSchema"]["columns"]
+        assert [col["datatype"].get("format") for col in columns[:2]] == ["true|false", "Y|N"]
+    assert profiler.get_boolean_format([0, 1]) == "1|0"
+
+
+def test_profiler_sampling():
+    """Test profiling a sample of rows infers the same datatypes, with min and max computed on all rows"""
+    fast_report = CsvwProfiler(config=OntomapConfig(profiling_engine="fast")).profile_files(
+        ["tests/resources/heart.csv"]
+    )
+    sample_report = CsvwProfiler(
+        config=OntomapConfig(profiling_engine="fast", sample_rows=200, chunk_size=100)
+    ).profile_files(["tests/resources/heart.csv"])
+    validate_csvw(sample_report)
+    sample_table = sample_report["tables"][-1]
+    assert sample_table["tableSchema"] == fast_report["tables"][-1]["tableSchema"]
+    assert sample_table[SAMPLING_PROPERTY]["rowsCount"] == 918
+    assert sample_table[SAMPLING_PROPERTY]["sampledRowsCount"] == 200
+
+
+def test_profiler_sampling_exact_bounds(tmp_path):
+    """Test the exact bounds of a sampled column keep their decimals when the sampled values are integers"""
+    csv_file = tmp_path / "values.csv"
+    csv_file.write_text("value\n" + "".join(f"{i}\n" for i in range(1000)) + "1000.5\n")
+    config = OntomapConfig(profiling_engine="fast", sample_rows=10)
+    datatype = CsvwProfiler(config=config).profile_files([str(csv_file)])["tables"][-1]["tableSchema"]["columns"][0][
+        "datatype"
+    ]
+    assert datatype == {"base": "number", "minimum": 0.0, "maximum": 1000.5}
+
+
+def test_profiler_columnar_formats(tmp_path):
+    """Test Parquet and Feather files are profiled like the CSV file they were written from"""
+    df = pd.read_csv("tests/resources/heart.csv")
+    files = [str(tmp_path / "heart.parquet"), str(tmp_path / "heart.feather")]
+    df.to_parquet(files[0], row_group_size=100)
+    df.to_feather(files[1])
+    csv_schema = (
+        CsvwProfiler(config=OntomapConfig(profiling_engine="fast")).profile_files(["tests/resources/heart.csv"])
+    )["tables"][-1]["tableSchema"]
+    for config in [OntomapConfig(profiling_engine="fast"), OntomapConfig(profiling_engine="fast", chunk_size=100)]:
+        csvw_report = CsvwProfiler(config=config).profile_files(files)
+        assert [table["tableSchema"] for table in csvw_report["tables"][-2:]] == [csv_schema, csv_schema]
+        assert "dialect" not in csvw_report["tables"][-1]
+
+
+def test_readers_arrow_min_max(tmp_path, monkeypatch):
+    """Test only the numeric columns without Parquet footer statistics are read to get their bounds"""
+    df = pd.read_csv("tests/resources/heart.csv")
+    parquet_file, feather_file = str(tmp_path / "heart.parquet"), str(tmp_path / "heart.feather")
+    df.to_parquet(parquet_file, row_group_size=100)
+    df.to_parquet(tmp_path / "no_stats.parquet", write_statistics=["Age"])
+    df.to_feather(feather_file)
+    expected = {name: (df[name].min(), df[name].max()) for name in df.select_dtypes("number").columns}
+
+    read_columns: List[Any] = []
+    read_arrow_table = readers.read_arrow_table
+    monkeypatch.setattr(
+        readers,
+        "read_arrow_table",
+        lambda file, columns=None: read_columns.append(columns) or read_arrow_table(file, columns),
+    )
+    assert readers.arrow_min_max(parquet_file) == expected
+    assert read_columns == []
+    assert readers.arrow_min_max(str(tmp_path / "no_stats.parquet"), ["Age", "MaxHR", "Sex"]) == {
+        "Age": expected["Age"],
+        "MaxHR": expected["MaxHR"],
+    }
+    assert read_columns == [["MaxHR"]]
+    assert readers.arrow_min_max(feather_file) == expected
+
+    # When reading by chunks, the bounds are computed from the batches
+    for file in [parquet_file, feather_file, str(tmp_path / "no_stats.parquet")]:
+        bounds: Dict[str, Any] = {}
+        assert sum(len(chunk) for chunk in readers.read_chunks(file, 100, bounds=bounds)) == len(df)
+        assert bounds == expected
+
+
+def test_profiler_dialect_and_columns(tmp_path):
+    """Test the dialect of delimited files is detected, and only the projected columns are profiled"""
+    df = pd.read_csv("tests/resources/heart.csv")
+    tsv_file = tmp_path / "heart.tsv"
+    semicolon_file = tmp_path / "heart_semicolon.csv"
+    df.to_csv(tsv_file, sep="\t", index=False)
+    df.to_csv(semicolon_file, sep=";", index=False)
+    config = OntomapConfig(profiling_engine="fast", columns=["Age", "Sex", "HeartDisease"])
+    csvw_report = CsvwProfiler(config=config).profile_files([str(tsv_file), str(semicolon_file)])
+    tsv_table, semicolon_table = csvw_report["tables"][-2:]
+    latin_file = tmp_path / "latin.csv"
+    latin_file.write_bytes("name;city\nJos\xe9;S\xe3o Paulo\n".encode("latin-1"))
+    assert readers.get_dialect(str(latin_file)) == {"delimiter": ";"}
+    assert tsv_table["dialect"] == {"delimiter": "\t"}
+    assert semicolon_table["dialect"] == {"delimiter": ";"}
+    assert [col["titles"] for col in tsv_table["tableSchema"]["columns"]] == ["Age", "Sex", "HeartDisease"]
+    assert tsv_table["tableSchema"] == semicolon_table["tableSchema"]
+
+
+def test_profiler_cache(tmp_path, monkeypatch):
+    """Test only new or changed files are profiled again with the profile cache, and removed files are pruned"""
+    df = pd.read_csv("tests/resources/heart.csv")
+    files = [tmp_path / "heart.csv", tmp_path / "copies" / "heart_copy.csv"]
+    files[1].parent.mkdir()
+    for file in files:
+        df.to_csv(file, index=False)
+    config = OntomapConfig(profiling_engine="fast", profile_cache=str(tmp_path / "cache.sqlite"))
+    first_report = CsvwProfiler(config=config).profile_files([str(tmp_path / "**" / "*.csv")])
+    assert [table["url"] for table in first_report["tables"]] == [str(file) for file in files]
+
+    profiled: List[str] = []
+    profile_table = profiler.profile_table
+    monkeypatch.setattr(
+        profiler, "profile_table", lambda file, *args: profiled.append(file) or profile_table(file, *args)
+    )
+    assert (
+        CsvwProfiler(config=config).profile_files([str(tmp_path / "**" / "*.csv")])["tables"] == first_report["tables"]
+    )
+    assert profiled == []
+
+    # Touching a file without changing its content does not profile it again
+    os.utime(files[0], (0, 0))
+    df.head(10).to_csv(files[1], index=False)
+    second_report = CsvwProfiler(config=config).profile_files([str(tmp_path / "**" / "*.csv")])
+    assert profiled == [str(files[1])]
+    assert second_report["tables"][0] == first_report["tables"][0]
+
+    config.sample_rows = 100
+    CsvwProfiler(config=config).profile_files([str(files[0])])
+    assert profiled == [str(files[1]), str(files[0])]
+
+    files[1].unlink()
+    CsvwProfiler(config=config).profile_files([str(files[0])])
+    assert len(ProfileCache(config.profile_cache)) == 1
+
+
+def test_profiler_write_files(tmp_path, monkeypatch):
+    """Test tables are written as soon as they are profiled, as a CSVW JSON document or JSON Lines"""
+    monkeypatch.setattr(profiler, "PROFILE_BATCH_SIZE", 1)
+    files = ["tests/resources/heart.csv", "tests/resources/heart.xlsx"]
+    config = OntomapConfig(profiling_engine="fast", report_metrics=True)
+    first_profiler = CsvwProfiler(config=config)
+    csvw_report = first_profiler.profile_files(files)
+
+    output = tmp_path / "csvw.json"
+    written_profiler = CsvwProfiler(config=config)
+    written: List[int] = []
+    profile_table = profiler.profile_table
+
+    def profile_and_check_written(*args):
+        written.append(output.read_text().count('"url"'))
+        return profile_table(*args)
+
+    monkeypatch.setattr(profiler, "profile_table", profile_and_check_written)
+    assert written_profiler.write_files(files, str(output)) == 2
+    assert written == [0, 1]
+    assert written_profiler.csvw["tables"] == []
+    written_report = json.loads(output.read_text())
+    assert list(written_report) == list(csvw_report)
+    assert written_report["tables"] == csvw_report["tables"]
+
+    CsvwProfiler(config=config).write_files(files, str(tmp_path / "csvw.jsonl"), json_lines=True)
+    lines = [json.loads(line) for line in (tmp_path / "csvw.jsonl").read_text().splitlines()]
+    assert [line["url"] for line in lines] == files
+    assert all(line["@context"] == csvw_report["@context"] for line in lines)
+
+    # The properties of previous runs are not written twice
+    first_profiler.write_files(files, str(output))
+    assert output.read_text().count('"dc:created"') == 1
+    assert list(json.loads(output.read_text())) == list(csvw_report)
+
+    # The document is left unfinished when the profiling fails
+    def profile_or_fail(file, *args):
+        if file.endswith(".xlsx"):
+            raise ValueError("Invalid file")
+        return profile_table(file, *args)
+
+    monkeypatch.setattr(profiler, "profile_table", profile_or_fail)
+    with pytest.raises(ValueError):
+        CsvwProfiler(config=config).write_files(files, str(output))
+    assert output.read_text().count('"url"') == 1
+    assert '"dc:created"' not in output.read_text()
+
+
+def test_profiler_isolated_instances():
+    """Test the tables of a profiler are not shared with other profilers"""
+    first = CsvwProfiler(config=OntomapConfig(profiling_engine="fast"))
+    first.profile_files(["tests/resources/heart.csv"])
+    assert len(first.csvw["tables"]) == 1
+    assert CsvwProfiler().csvw["tables"] == []
+
+
+def test_profiler_parallel():
+    """Test profiling files in a pool of processes keeps the tables in the same order"""
+    files = ["tests/resources/heart.xlsx", "tests/resources/heart.csv"]
+    seq_report = CsvwProfiler(config=OntomapConfig(profiling_engine="fast")).profile_files(files)
+    seq_tables = json.loads(json.dumps(seq_report["tables"][-2:]))
+    par_report = CsvwProfiler(config=OntomapConfig(profiling_engine="fast", workers=2)).profile_files(files)
+    assert [table["url"] for table in par_report["tables"][-2:]] == files
+    assert par_report["tables"][-2:] == seq_tables
+
+
+def test_profiler_metrics():
+    """Test the time and rows of each stage are recorded, and added to the CSVW metadata when enabled"""
+    profiler = CsvwProfiler(config=OntomapConfig(profiling_engine="fast", report_metrics=True))
+    csvw_report = profiler.profile_files(["tests/resources/heart.csv"])
+    validate_csvw(csvw_report)
+    metrics = csvw_report[METRICS_PROPERTY]
+    assert set(metrics) == {"read", "profile_fast", "profile_files"}
+    assert metrics["read"]["rows"] == 918
+    assert metrics["profile_fast"]["columns"] == 12
+    # The stages containing other stages raised the peak memory at least as much
+    assert metrics["profile_files"]["peak_rss_increase_mb"] >= metrics["read"]["peak_rss_increase_mb"] >= 0
+    assert metrics["profile_files"]["process_peak_rss_mb"] >= metrics["read"]["process_peak_rss_mb"] > 0
+    assert "profile_files" in profiler.metrics.summary()
+
+
 def test_profiler_with_ontology():
     """Test the Profiler with ontology"""
     profiler = CsvwProfiler(ONTOLOGIES)
@@ -0,0 +1,88 @@
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+
+import pytest
+
+from csvw_ontomap.ontology import OntologySearcher
+from csvw_ontomap.server import OntomapServer
+from csvw_ontomap.utils import OntomapConfig
+
+from .helpers import ONTOLOGY_TTL, StubEmbedding
+
+
+@pytest.fixture()
+def server(tmp_path):
+    onto_file = tmp_path / "onto.ttl"
+    onto_file.write_text(ONTOLOGY_TTL)
+    model = StubEmbedding()
+    searcher = OntologySearcher(str(tmp_path / "vectordb"), embedding_model=model, cache_size=0)
+    searcher.load([str(onto_file)])
+    model.calls = []
+    server = OntomapServer(("127.0.0.1", 0), searcher, OntomapConfig(profiling_engine="fast"), batch_wait=0.2)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server, model
+    server.shutdown()
+    server.server_close()
+
+
+def request(server: OntomapServer, path: str, body: Optional[Any] = None) -> Any:
+    url = f"http://127.0.0.1:{server.server_address[1]}{path}"
+    data = json.dumps(body).encode() if body is not None else None
+    with urllib.request.urlopen(urllib.request.Request(url, data=data)) as response:
+        return json.loads(response.read())
+
+
+def test_server_batch_concurrent_searches(server):
+    """Test searches of concurrent requests are embedded in a shared batch"""
+    server, model = server
+    queries = ["patient gender", "person name", "birth date of patient", "age of person"]
+    with ThreadPoolExecutor(len(queries)) as executor:
+        responses = list(executor.map(lambda query: request(server, "/search", {"queries": [query]}), queries))
+    assert [response["results"][0][0]["id"] for response in responses] == [
+        "http://example.org/Gender",
+        "http://example.org/Person",
+        "http://example.org/birthDate",
+        "http://example.org/hasAge",
+    ]
+    assert len(model.calls) < len(queries)
+
+
+def test_server_profile_job(server):
+    """Test files are profiled in a background job, and their columns mapped with the loaded ontology"""
+    server, _model = server
+    job = request(server, "/profile", {"files": ["tests/resources/heart.csv"]})
+    assert job["status"] in ("pending", "running")
+    for _ in range(100):
+        job = request(server, f"/jobs/{job['id']}")
+        if job["status"] in ("done", "failed"):
+            break
+        time.sleep(0.1)
+    assert job["status"] == "done"
+    age_col = job["result"]["tables"][0]["tableSchema"]["columns"][0]
+    assert age_col["propertyUrl"] == "http://example.org/hasAge"
+
+
+@pytest.mark.parametrize(
+    "path, body",
+    [
+        ("/search", {"queries": "patient age"}),
+        ("/search", {"queries": ["patient age"], "limit": "3"}),
+        ("/search", {"queries": ["patient age"], "term_types": "property"}),
+        ("/profile", {"files": "tests/resources/heart.csv"}),
+        ("/profile", {"files": ["tests/resources/heart.csv"], "config": {"chunk_size": "100"}}),
+        ("/profile", {"files": ["tests/resources/heart.csv"], "config": {"profile_cache": "cache.db"}}),
+        ("/profile", {"files": ["tests/resources/heart.csv"], "config": {"workers": 64}}),
+    ],
+)
+def test_server_invalid_request(server, path, body):
+    """Test requests with invalid parameters, or overriding config fields of the server, are rejected"""
+    server, _model = server
+    with pytest.raises(urllib.error.HTTPError) as e:
+        request(server, path, body)
+    assert e.value.code == 400
+    assert "error" in json.loads(e.value.read())